@@ -0,0 +1,153 @@
+"""行为表的倒排索引：行为 -> 含有该行为的索引
+
+每个行为对应一个以索引为键的字典（当作有序集合使用，按登记顺序排列），
+登记和撤销都是 O(1)。按行为查询的开销只与结果数量有关，与表的大小无关；
+同时要求多个行为时从最短的那个集合出发逐个检查。
+
+索引在第一次查询时由表建立（一次 O(表大小) 的扫描），之后随表的修改维护。
+"""
+
+import json
+
+
+def action_key(action):
+    """行为在倒排索引中的键
+
+    键里带上类型名：1、1.0 和 True 彼此相等、哈希值也相同，但在 JSON 中是不同的行为。
+    JSON 中的列表 / 字典不可哈希，按规范化的 JSON 文本登记（其中的 1、1.0 和 true
+    写法不同，同样不会混在一起）。
+    """
+    try:
+        hash(action)
+    except TypeError:
+        return (type(action).__name__, json.dumps(action, sort_keys=True, ensure_ascii=False))
+    return (type(action).__name__, action)
+
+
+def unique_actions(actions):
+    """按首次出现的顺序去掉重复的行为（按 action_key 判断是否重复）"""
+    seen = set()
+    unique = []
+    for action in actions:
+        key = action_key(action)
+        if key not in seen:
+            seen.add(key)
+            unique.append(action)
+    return unique
+
+
+def has_action(entry, action):
+    """行为表条目中是否有与 action 相同的行为（按 action_key 判断）
+
+    直接在条目上查找，不切片复制；action_key 相同的行为一定相等，
+    只为与 action 相等的行为计算键。
+    """
+    key = None
+    for position in range(1, len(entry)):
+        other = entry[position]
+        if other == action:
+            if key is None:
+                key = action_key(action)
+            if action_key(other) == key:
+                return True
+    return False
+
+
+class ActionIndex:
+    """行为 -> {索引: None} 的倒排索引"""
+
+    def __init__(self):
+        self.postings = {}
+
+    @classmethod
+    def build(cls, entries):
+        """由 (索引, 行为序列) 建立索引"""
+        index = cls()
+        postings = index.postings
+        for index_str, actions in entries:
+            for action in actions:
+                key = action_key(action)
+                posting = postings.get(key)
+                if posting is None:
+                    posting = postings[key] = {}
+                posting[index_str] = None
+        return index
+
+    def copy(self):
+        """复制一份可以独立修改的索引"""
+        index = ActionIndex()
+        index.postings = {key: dict(posting) for key, posting in self.postings.items()}
+        return index
+
+    def add(self, index_str, actions):
+        """登记一个条目的行为"""
+        for action in actions:
+            self.postings.setdefault(action_key(action), {})[index_str] = None
+
+    def remove(self, index_str, actions):
+        """撤销一个条目的行为"""
+        for action in actions:
+            key = action_key(action)
+            posting = self.postings.get(key)
+            if posting is not None:
+                posting.pop(index_str, None)
+                if not posting:
+                    del self.postings[key]
+
+    def indices(self, action):
+        """含有该行为的索引列表（按登记顺序）"""
+        return list(self.postings.get(action_key(action), ()))
+
+    def any(self, actions):
+        """含有其中任意一个行为的索引列表（按行为的顺序合并，去重）"""
+        result = {}
+        for action in actions:
+            posting = self.postings.get(action_key(action))
+            if posting:
+                result.update(posting)
+        return list(result)
+
+    def all(self, actions):
+        """同时含有所有行为的索引列表（没有给出行为时返回空列表）"""
+        postings = []
+        for action in actions:
+            posting = self.postings.get(action_key(action))
+            if not posting:
+                return []
+            postings.append(posting)
+        if not postings:
+            return []
+        postings.sort(key=len)
+        shortest, rest = postings[0], postings[1:]
+        return [index_str for index_str in shortest if all(index_str in p for p in rest)]
+
+    def __len__(self):
+        """不同行为的数量"""
+        return len(self.postings)
+
+
+class ActionQueries:
+    """按行为查询词的方法，供 ActionTable 和 MappedActionTable 共用
+
+    使用方提供 action_index 属性和 index2word 方法。
+    """
+
+    def indices_by_action(self, action):
+        """含有该行为的所有索引"""
+        return self.action_index.indices(action)
+
+    def _indices_to_words(self, indices):
+        # 同一个词可能对应多个索引，只保留第一次出现
+        return list(dict.fromkeys(self.index2word(index_str) for index_str in indices))
+
+    def words_by_action(self, action):
+        """含有该行为的所有词"""
+        return self._indices_to_words(self.action_index.indices(action))
+
+    def words_by_any_action(self, actions):
+        """含有其中任意一个行为的所有词"""
+        return self._indices_to_words(self.action_index.any(actions))
+
+    def words_by_all_actions(self, actions):
+        """同时含有所有行为的词"""
+        return self._indices_to_words(self.action_index.all(actions))
@@ -1,33 +1,131 @@
+import contextlib
+import copy
 import json
+import weakref
+from Models.Parser.ActionIndex import ActionIndex, ActionQueries, action_key, has_action, unique_actions
+from Models.Parser.ChangeLog import ChangeLog
+from Models.Parser.Records import Entry, paused_gc
 
-class ActionTable:
-    def __init__(self, json_file='actions.json'):
+class ActionTable(ActionQueries):
+    def __init__(self, json_file='actions.json', data=None, shards=None):
+        """
+        Args:
+            json_file: 表文件路径（保存时写入该文件）
+            data: 已加载的表数据（例如来自二进制快照），提供时不再读取 json_file
+            shards: 分片存储（见 Models.Parser.ShardStore），提供时条目和反向索引
+                    都从分片按需加载，修改写回分片
+        """
         self.json_file = json_file
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.action_dict = json.load(f)
+        self.version = 0
+        # 词的增删通知（例如分词器据此增量维护前缀表），见 _index_add / _index_remove
+        self.word_listeners = weakref.WeakSet()
+        # 行为 -> 索引 的倒排索引，第一次按行为查询时建立
+        self._action_index = None
+        if shards is not None:
+            self.change_log = shards.change_log()
+            self.action_dict = shards.entries
+            self.word_index = shards.words
+            return
+        
+        self.change_log = ChangeLog(json_file)
+        with paused_gc():
+            if data is None:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 重放上次压缩之后追加的修改
+                self.change_log.replay(data)
+            # 条目转换为紧凑的 Entry 元组
+            Entry.convert_table(data)
+            self._unique_entries(data)
+            self.action_dict = data
+            self._build_word_index()
+    
+    @staticmethod
+    def _unique_entries(data):
+        """就地去掉文件中各条目里重复的行为（与 set_an_action 一样只保留第一个）
+
+        文件本身在下一次压缩（save）时才会改写。
+        """
+        for index, entry in data.items():
+            if len(entry) > 2:
+                actions = entry.items
+                unique = unique_actions(actions)
+                if len(unique) != len(actions):
+                    data[index] = Entry(entry.word, unique)
+    
+    def _build_word_index(self):
+        """构建 词 -> 索引列表 的反向索引（同一个词可能对应多个索引）"""
+        # 索引列表只会被整体替换，存为元组以节省内存
+        self.word_index = word_index = {}
+        for index, entry in self.action_dict.items():
+            if entry:
+                indices = word_index.get(entry.word)
+                word_index[entry.word] = (index,) if indices is None else (*indices, index)
+        for listener in list(self.word_listeners):
+            listener.words_reset(self)
+    
+    # 反向索引和条目都通过重新赋值来修改，分片存储据此知道哪些分片需要写回
+    
+    def _index_add(self, index_str, word):
+        """将索引登记到反向索引中"""
+        indices = self.word_index.get(word, ())
+        if index_str not in indices:
+            self.word_index[word] = (*indices, index_str)
+            if not indices:
+                for listener in list(self.word_listeners):
+                    listener.word_added(self, word)
+    
+    def _index_remove(self, index_str, word):
+        """从反向索引中移除索引"""
+        indices = self.word_index.get(word)
+        if indices and index_str in indices:
+            indices = tuple(i for i in indices if i != index_str)
+            if indices:
+                self.word_index[word] = indices
+            else:
+                del self.word_index[word]
+                for listener in list(self.word_listeners):
+                    listener.word_removed(self, word)
+    
+    @property
+    def action_index(self):
+        """行为 -> 索引 的倒排索引（见 Models.Parser.ActionIndex）
+
+        第一次访问时扫描整张表建立（分片模式下依次读取所有分片，不填充分片缓存），之后随修改维护。
+        """
+        if self._action_index is None:
+            self._action_index = ActionIndex.build(
+                (index, entry.items) for index, entry in self.action_dict.items() if entry
+            )
+        return self._action_index
+    
+    def _actions_add(self, index_str, entry):
+        """把条目的行为登记到倒排索引中（索引尚未建立时不需要维护）"""
+        if self._action_index is not None and entry:
+            self._action_index.add(index_str, entry.items)
+    
+    def _actions_remove(self, index_str, entry):
+        """从倒排索引中撤销条目的行为"""
+        if self._action_index is not None and entry:
+            self._action_index.remove(index_str, entry.items)
     
     def get_actions_from_word(self, word):
-        """根据词获取对应的行为列表"""
-        for index, items in self.action_dict.items():
-            # items[0] 是词本身，后面的都是行为
-            if items and items[0] == word:
-                if len(items) > 1:
-                    return items[1:]  # 返回行为列表
-                return []  # 有词但没有行为
-        return None  # 没找到词
+        """根据词获取对应的行为列表（每次返回新的列表）"""
+        index = self.word2index(word)
+        if index is None:
+            return None  # 没找到词
+        return list(self.action_dict[index].items)  # 有词但没有行为时是空列表
     
     def get_actions_from_index(self, index):
         """根据索引获取对应的词和行为"""
         index_str = str(index)
         if index_str in self.action_dict:
-            items = self.action_dict[index_str]
-            if items:
-                word = items[0]
-                actions = items[1:] if len(items) > 1 else []
+            entry = self.action_dict[index_str]
+            if entry:
                 return {
                     'index': index_str,
-                    'word': word,
-                    'actions': actions
+                    'word': entry.word,
+                    'actions': list(entry.items)
                 }
         return None
     
@@ -37,7 +135,7 @@ class ActionTable:
         Args:
             index: 索引
             word: 词本身
-            actions: 行为列表（可选）
+            actions: 行为列表（可选），重复的行为只保留第一个
             save: 是否立即保存到文件
         """
         if actions is None:
@@ -45,18 +143,25 @@ class ActionTable:
         
         index_str = str(index)
         
-        # 构建条目：第一个元素是词，后面是行为
-        entry = [word] + actions
+        # 行为按有序集合保存
+        entry = Entry(word, unique_actions(actions))
+        
+        self._remember(index_str)
         
         # 检查索引是否已存在
         if index_str in self.action_dict:
             print(f"警告：索引 {index} 已存在，将覆盖原有内容")
-            print(f"原内容：词 '{self.action_dict[index_str][0]}'，行为 {self.action_dict[index_str][1:]}")
+            old_entry = self.action_dict[index_str]
+            if old_entry:
+                print(f"原内容：词 '{old_entry.word}'，行为 {list(old_entry.items)}")
+                self._index_remove(index_str, old_entry.word)
+                self._actions_remove(index_str, old_entry)
         
         self.action_dict[index_str] = entry
+        self._index_add(index_str, word)
+        self._actions_add(index_str, entry)
         
-        if save:
-            self.save()
+        self._persist(save, index_str)
         
         return True
     
@@ -64,10 +169,20 @@ class ActionTable:
         """为指定索引添加一个新的行为"""
         index_str = str(index)
         if index_str in self.action_dict:
-            if action not in self.action_dict[index_str][1:]:  # 检查行为是否已存在
-                self.action_dict[index_str].append(action)
-                if save:
-                    self.save()
+            entry = self.action_dict[index_str]
+            if not entry:
+                # 空条目没有词：与在 [] 后追加一致，行为成为条目的第一个元素（即词）
+                self._remember(index_str)
+                self.action_dict[index_str] = Entry(action)
+                self._index_add(index_str, action)
+                self._persist(save, index_str)
+                return True
+            if not has_action(entry, action):  # 检查行为是否已存在（1、1.0 和 True 是不同的行为）
+                self._remember(index_str)
+                self.action_dict[index_str] = Entry(entry.word, entry.items + (action,))
+                if self._action_index is not None:
+                    self._action_index.add(index_str, (action,))
+                self._persist(save, index_str)
                 return True
             else:
                 print(f"行为 '{action}' 已存在")
@@ -85,11 +200,16 @@ class ActionTable:
     
     def word2index(self, word):
         """根据词查找对应的索引"""
-        for index, items in self.action_dict.items():
-            if items and items[0] == word:
-                return index
+        indices = self.word_index.get(word)
+        if indices:
+            # 同一个词有多个索引时返回第一个
+            return indices[0]
         return None
     
+    def word2indices(self, word):
+        """根据词查找所有对应的索引"""
+        return list(self.word_index.get(word, ()))
+    
     def index2word(self, index):
         """根据索引返回词"""
         index_str = str(index)
@@ -101,11 +221,16 @@ class ActionTable:
         """从指定索引移除一个行为"""
         index_str = str(index)
         if index_str in self.action_dict:
-            items = self.action_dict[index_str]
-            if action in items[1:]:  # 在行为列表中查找
-                items.remove(action)
-                if save:
-                    self.save()
+            entry = self.action_dict[index_str]
+            if entry and has_action(entry, action):  # 在行为列表中查找
+                self._remember(index_str)
+                key = action_key(action)
+                self.action_dict[index_str] = Entry(
+                    entry.word, tuple(a for a in entry.items if a != action or action_key(a) != key)
+                )
+                if self._action_index is not None:
+                    self._action_index.remove(index_str, (action,))
+                self._persist(save, index_str)
                 return True
         return False
     
@@ -113,9 +238,12 @@ class ActionTable:
         """删除一个索引及其对应的词和行为"""
         index_str = str(index)
         if index_str in self.action_dict:
-            del self.action_dict[index_str]
-            if save:
-                self.save()
+            self._remember(index_str)
+            entry = self.action_dict.pop(index_str)
+            if entry:
+                self._index_remove(index_str, entry.word)
+                self._actions_remove(index_str, entry)
+            self._persist(save, index_str)
             return True
         return False
     
@@ -123,29 +251,89 @@ class ActionTable:
         """更新指定索引的词（保持行为不变）"""
         index_str = str(index)
         if index_str in self.action_dict:
-            actions = self.action_dict[index_str][1:]  # 保留原有行为
-            self.action_dict[index_str] = [new_word] + actions
-            if save:
-                self.save()
+            self._remember(index_str)
+            entry = self.action_dict[index_str]
+            actions = entry.items if entry else ()  # 保留原有行为
+            if entry:
+                self._index_remove(index_str, entry.word)
+            self.action_dict[index_str] = Entry(new_word, actions)
+            self._index_add(index_str, new_word)
+            self._persist(save, index_str)
             return True
         return False
     
+    def entries(self):
+        """按表中顺序遍历 (索引, 条目)（分片模式下是全表扫描）"""
+        return self.action_dict.items()
+    
     def get_all_words(self):
-        """获取所有词"""
+        """获取所有词（分片模式下是全表扫描，依次读取所有分片）"""
         words = []
-        for items in self.action_dict.values():
-            if items:
-                words.append(items[0])
+        for entry in self.action_dict.values():
+            if entry:
+                words.append(entry.word)
         return words
     
     def get_all_indices(self):
         """获取所有索引"""
         return list(self.action_dict.keys())
     
+    def _remember(self, *path):
+        """批量修改中保存即将被修改的键的原内容"""
+        self.change_log.remember(self.action_dict, list(path))
+    
+    def _persist(self, save, *path):
+        """把一次修改追加到变更日志（O(1) 写入）；save 为假时留到下一次写入，批量修改中推迟到退出时写入"""
+        # 每次修改都会经过这里，顺便递增版本号，依赖行为表的缓存据此失效
+        self.version += 1
+        self.change_log.record(self.action_dict, list(path), save)
+    
+    @contextlib.contextmanager
+    def batch(self, save=True):
+        """批量修改：退出时一次性写入变更日志，发生异常时回滚所有修改
+        
+        Args:
+            save: 退出时是否写入文件
+        """
+        self.change_log.begin()
+        try:
+            yield self
+        except BaseException:
+            restored = self.change_log.rollback(self.action_dict)
+            self.version += 1
+            # 只修正被回滚的条目在反向索引中的登记
+            for (index,), discarded in restored or ():
+                if discarded:
+                    self._index_remove(index, discarded.word)
+                    self._actions_remove(index, discarded)
+                entry = self.action_dict.get(index)
+                if entry:
+                    self._index_add(index, entry.word)
+                    self._actions_add(index, entry)
+            raise
+        else:
+            self.change_log.commit(self.action_dict, save)
+    
+    def copy(self):
+        """复制一份可以独立修改的行为表
+        
+        条目不可变，只复制条目字典和反向索引本身；变更日志写入同一个文件，
+        但有自己的批量修改状态（见 ChangeLog.copy），word_listeners 不继承。
+        """
+        if not isinstance(self.action_dict, dict):
+            raise ValueError("分片存储的行为表不能复制")
+        table = copy.copy(self)
+        table.action_dict = dict(self.action_dict)
+        table.word_index = dict(self.word_index)
+        table.word_listeners = weakref.WeakSet()
+        table.change_log = self.change_log.copy()
+        if self._action_index is not None:
+            table._action_index = self._action_index.copy()
+        return table
+    
     def save(self):
-        """保存数据到文件"""
-        with open(self.json_file, 'w', encoding='utf-8') as f:
-            json.dump(self.action_dict, f, indent=4, ensure_ascii=False)
+        """保存数据到文件（原子地重写完整快照并清空变更日志）"""
+        self.change_log.compact(self.action_dict)
     
     def __str__(self):
         """字符串表示"""
@@ -153,11 +341,9 @@ class ActionTable:
             return "行为表为空"
         
         result = "行为表内容：\n"
-        for index, items in self.action_dict.items():
-            if items:
-                word = items[0]
-                actions = items[1:] if len(items) > 1 else []
-                result += f"索引 {index}: 词 '{word}' -> 行为: {actions}\n"
+        for index, entry in self.action_dict.items():
+            if entry:
+                result += f"索引 {index}: 词 '{entry.word}' -> 行为: {list(entry.items)}\n"
         return result
     
     def __len__(self):
@@ -0,0 +1,220 @@
+import collections.abc
+import copy
+import json
+import os
+from Models.Parser.Records import to_json
+
+_MISSING = object()
+
+class ChangeLog:
+    """表文件的追加式变更日志
+
+    每次修改只向 ``<json_file>.log`` 追加一行记录（被修改键的最新内容），
+    记录数达到阈值后再压缩回 JSON 快照。快照通过临时文件 + 原子重命名写入，
+    写入中途崩溃不会损坏原文件。
+
+    在 begin() / commit() 之间（批量修改），记录只在内存中缓冲，
+    并保存被修改键的原内容以便 rollback() 回滚。
+
+    save=False 的修改只记下键；之后任何一次写入日志（save=True 的修改或批量提交）
+    都会连同这些键的最新内容一起写入，与整表保存的效果一致。
+    """
+
+    def __init__(self, json_file, compact_threshold=10000):
+        self.json_file = json_file
+        self.log_file = json_file + '.log'
+        self.compact_threshold = compact_threshold
+        self.pending = 0  # 日志中尚未压缩的记录数
+        self.batch_depth = 0
+        self._dirty = {}  # 批量修改中被修改过的键路径（有序）
+        self._undo = {}   # 批量修改中被修改键的原内容
+        self._unsaved = {}  # save=False 修改过、尚未写入日志的键路径（有序）
+        self.frozen = None  # 不允许写入文件时的原因（例如数据来自无法校验的快照）
+
+    @property
+    def batching(self):
+        """是否处于批量修改中"""
+        return self.batch_depth > 0
+
+    def replay(self, data):
+        """将日志中的变更应用到从快照读取的数据上"""
+        if not os.path.exists(self.log_file):
+            return data
+
+        good_offset = 0
+        with open(self.log_file, 'rb') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    if not line.endswith(b'\n'):
+                        # 上次写入中途崩溃留下的不完整末行，截掉
+                        break
+                    # 之后的追加已经补上换行，跳过这条损坏的记录，保留其后的记录
+                    good_offset += len(line)
+                    continue
+                self._apply(data, record)
+                good_offset += len(line)
+                self.pending += 1
+
+        if good_offset < os.path.getsize(self.log_file):
+            with open(self.log_file, 'r+b') as f:
+                f.truncate(good_offset)
+        return data
+
+    def _apply(self, data, record):
+        """应用一条日志记录"""
+        # 与 json.dump 保持一致：键总是字符串
+        path = [str(key) for key in record['path']]
+        target = data
+        for key in path[:-1]:
+            target = target.setdefault(key, {})
+        if record.get('deleted'):
+            target.pop(path[-1], None)
+        else:
+            target[path[-1]] = record['value']
+
+    def _lookup(self, data, path):
+        """按键路径取值，不存在时返回 _MISSING"""
+        target = data
+        for key in path:
+            if not isinstance(target, collections.abc.Mapping) or key not in target:
+                return _MISSING
+            target = target[key]
+        return target
+
+    def _make_record(self, data, path):
+        """生成 path 处最新内容的日志记录"""
+        value = self._lookup(data, path)
+        if value is _MISSING:
+            return {'path': list(path), 'deleted': True}
+        return {'path': list(path), 'value': value}
+
+    def remember(self, data, path):
+        """批量修改中，在修改 path 之前保存它的原内容"""
+        if self.batching:
+            path = tuple(path)
+            if path not in self._undo:
+                value = self._lookup(data, path)
+                if value is not _MISSING:
+                    value = copy.deepcopy(value)
+                self._undo[path] = value
+
+    def record(self, data, path, save=True):
+        """记录 data 中 path 处的最新内容（不存在则记为删除）
+
+        Args:
+            data: 表的完整数据
+            path: 键路径，例如 [index] 或 [rule_name, index]
+            save: 是否立即写入日志；为假时只记下键，留到下一次写入
+        """
+        path = tuple(path)
+        if self.batching:
+            # 批量修改中只记下键，退出时统一写入最终内容
+            self._dirty[path] = None
+            return
+        self._unsaved[path] = None
+        if save:
+            self._flush(data)
+
+    def _flush(self, data):
+        """把所有尚未写入的键的最新内容追加到日志"""
+        paths, self._unsaved = self._unsaved, {}
+        self.append([self._make_record(data, path) for path in paths])
+        if self.pending >= self.compact_threshold:
+            self.compact(data)
+
+    def begin(self):
+        """开始批量修改（嵌套调用会并入最外层）"""
+        if self.batch_depth == 0:
+            self._dirty = {}
+            self._undo = {}
+        self.batch_depth += 1
+
+    def commit(self, data, save=True):
+        """结束批量修改，最外层时一次性写入所有被修改键的最新内容"""
+        self.batch_depth -= 1
+        if self.batch_depth > 0:
+            return
+        self._unsaved.update(self._dirty)
+        if save:
+            self._flush(data)
+        self._dirty = {}
+        self._undo = {}
+
+    def rollback(self, data):
+        """放弃批量修改
+
+        Returns:
+            嵌套的内层调用返回 None；最外层恢复被修改键的原内容，
+            并返回 [(键路径, 被丢弃的内容或 None), ...]
+        """
+        self.batch_depth -= 1
+        if self.batch_depth > 0:
+            return None
+        restored = []
+        # 倒序恢复，保证外层键（如新建的规则组）最后处理
+        for path, value in reversed(list(self._undo.items())):
+            target = data
+            for key in path[:-1]:
+                target = target.setdefault(key, {})
+            if value is _MISSING:
+                discarded = target.pop(path[-1], None)
+            else:
+                discarded = target.get(path[-1])
+                target[path[-1]] = value
+            restored.append((path, discarded))
+        self._dirty = {}
+        self._undo = {}
+        return restored
+
+    def copy(self):
+        """复制一份独立的状态（写入同一组文件），供复制出的表使用
+
+        尚未写入的键和日志中的记录数随之复制，批量修改的状态不复制：
+        原表和副本各自开始、提交或回滚自己的批量修改。
+        """
+        change_log = copy.copy(self)
+        change_log.batch_depth = 0
+        change_log._dirty = {}
+        change_log._undo = {}
+        change_log._unsaved = dict(self._unsaved)
+        return change_log
+
+    def append(self, records):
+        """一次性追加多条记录"""
+        if not records:
+            return
+        if self.frozen:
+            raise ValueError(self.frozen)
+        lines = ''.join(
+            json.dumps(record, ensure_ascii=False, default=to_json) + '\n' for record in records
+        ).encode('utf-8')
+        with open(self.log_file, 'a+b') as f:
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                # 上次写入中途崩溃时末行没有换行，先补上，避免与新记录连成一行
+                f.seek(end - 1)
+                if f.read(1) != b'\n':
+                    lines = b'\n' + lines
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+        self.pending += len(records)
+
+    def compact(self, data):
+        """把完整数据写回 JSON 快照并清空日志"""
+        if self.frozen:
+            raise ValueError(self.frozen)
+        tmp_file = self.json_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False, default=to_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.json_file)
+
+        # 快照已包含全部变更；即使删除日志前崩溃，重放日志也只会写入相同的内容
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.pending = 0
+        self._unsaved = {}
@@ -13,15 +13,17 @@ class DefinitionType(enum.Enum):
 
     @staticmethod
     def from_string(s):
-        for member in DefinitionType:
-            if member.name == s:
-                return member
-        raise ValueError(f"Invalid DefinitionType: {s}")
-    def from_value(value): 
-        for member in DefinitionType:
-            if member.value == value:
-                return member
-        raise ValueError(f"Invalid DefinitionType value: {value}")
+        member = NAME_TABLES[DefinitionType].get(s)
+        if member is None:
+            raise ValueError(f"Invalid DefinitionType: {s}")
+        return member
+
+    @staticmethod
+    def from_value(value):
+        member = decode_value(DefinitionType, value)
+        if member is None:
+            raise ValueError(f"Invalid DefinitionType value: {value}")
+        return member
 
 class MoodType(enum.Enum):
     indicative = 1
@@ -34,15 +36,17 @@ class MoodType(enum.Enum):
 
     @staticmethod
     def from_string(s):
-        for member in MoodType:
-            if member.name == s:
-                return member
-        raise ValueError(f"Invalid MoodType: {s}")
+        member = NAME_TABLES[MoodType].get(s)
+        if member is None:
+            raise ValueError(f"Invalid MoodType: {s}")
+        return member
+
+    @staticmethod
     def from_value(value):
-        for member in MoodType:
-            if member.value == value:
-                return member
-        raise ValueError(f"Invalid MoodType value: {value}")
+        member = decode_value(MoodType, value)
+        if member is None:
+            raise ValueError(f"Invalid MoodType value: {value}")
+        return member
 class TenseType(enum.Enum):
     present = 1
     past = 2
@@ -53,15 +57,17 @@ class TenseType(enum.Enum):
 
     @staticmethod
     def from_string(s):
-        for member in TenseType:
-            if member.name == s:
-                return member
-        raise ValueError(f"Invalid TenseType: {s}")
+        member = NAME_TABLES[TenseType].get(s)
+        if member is None:
+            raise ValueError(f"Invalid TenseType: {s}")
+        return member
+
+    @staticmethod
     def from_value(value):
-        for member in TenseType:
-            if member.value == value:
-                return member
-        raise ValueError(f"Invalid TenseType value: {value}")
+        member = decode_value(TenseType, value)
+        if member is None:
+            raise ValueError(f"Invalid TenseType value: {value}")
+        return member
 class OtherType(enum.Enum):
     """Additional types for custom"""
     plural = 1
@@ -112,15 +118,57 @@ class OtherType(enum.Enum):
 
     @staticmethod
     def from_string(s):
-        for member in OtherType:
-            if member.name == s:
-                return member
-        raise ValueError(f"Invalid OtherType: {s}")
+        member = NAME_TABLES[OtherType].get(s)
+        if member is None:
+            raise ValueError(f"Invalid OtherType: {s}")
+        return member
+
+    @staticmethod
     def from_value(value):
-        for member in OtherType:
-            if member.value == value:
-                return member
-        raise ValueError(f"Invalid OtherType value: {value}")
+        member = decode_value(OtherType, value)
+        if member is None:
+            raise ValueError(f"Invalid OtherType value: {value}")
+        return member
+
+
+# ---- 预计算的解码表 ----
+# 四类词性共用一个全局编码空间：code = 族编号 << 8 | 枚举值（族编号从 1 开始）。
+# 解码一个词性只需要一次查表，不再遍历枚举成员或依赖异常处理。
+
+TYPE_FAMILIES = (DefinitionType, MoodType, TenseType, OtherType)
+FAMILY_BY_NAME = {family.__name__: family for family in TYPE_FAMILIES}
+FAMILY_CODES = {family: number + 1 for number, family in enumerate(TYPE_FAMILIES)}
+
+# 族 -> 按值下标的稠密数组 / 名称字典
+VALUE_TABLES = {}
+NAME_TABLES = {}
+# 全局编码 -> 成员（稠密数组），成员 -> 全局编码，成员 -> 连续序号（0..65，用作位号）
+FEATURE_BY_CODE = [None] * ((len(TYPE_FAMILIES) + 1) << 8)
+FEATURE_CODES = {}
+FEATURE_ORDINALS = {}
+
+for _family in TYPE_FAMILIES:
+    _values = [None] * (max(member.value for member in _family) + 1)
+    for _member in _family:
+        _values[_member.value] = _member
+        _code = FAMILY_CODES[_family] << 8 | _member.value
+        FEATURE_BY_CODE[_code] = _member
+        FEATURE_CODES[_member] = _code
+        FEATURE_ORDINALS[_member] = len(FEATURE_ORDINALS)
+    VALUE_TABLES[_family] = _values
+    NAME_TABLES[_family] = {member.name: member for member in _family}
+del _family, _values, _member, _code
 
-	
 
+def decode_value(family, value):
+    """按值解码某一族的成员，无效时返回 None"""
+    if type(value) is int:
+        values = VALUE_TABLES[family]
+        if 0 <= value < len(values):
+            return values[value]
+        return None
+    try:
+        # 与 Enum(value) 的行为保持一致（例如 1.0 == 1）
+        return family(value)
+    except (ValueError, TypeError):
+        return None
@@ -1,34 +1,99 @@
+import contextlib
+import copy
 import json
+import weakref
+from Models.Parser.ChangeLog import ChangeLog
+from Models.Parser.Records import Entry, paused_gc
 
 class DicTable:
-    def __init__(self, json_file='dics.json'):
+    def __init__(self, json_file='dics.json', data=None, shards=None):
+        """
+        Args:
+            json_file: 表文件路径（保存时写入该文件）
+            data: 已加载的表数据（例如来自二进制快照），提供时不再读取 json_file
+            shards: 分片存储（见 Models.Parser.ShardStore），提供时条目和反向索引
+                    都从分片按需加载，修改写回分片
+        """
         self.json_file = json_file
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.dic_dict = json.load(f)
+        self.version = 0
+        # 词的增删通知（例如分词器据此增量维护前缀表），见 _index_add / _index_remove
+        self.word_listeners = weakref.WeakSet()
+        if shards is not None:
+            self.change_log = shards.change_log()
+            self.dic_dict = shards.entries
+            self.word_index = shards.words
+            return
+        
+        self.change_log = ChangeLog(json_file)
+        with paused_gc():
+            if data is None:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 重放上次压缩之后追加的修改
+                self.change_log.replay(data)
+            # 条目转换为紧凑的 Entry 元组
+            Entry.convert_table(data)
+            self.dic_dict = data
+            self._build_word_index()
+    
+    def _build_word_index(self):
+        """构建 词 -> 索引列表 的反向索引（同一个词可能对应多个索引）"""
+        # 索引列表只会被整体替换，存为元组以节省内存
+        self.word_index = word_index = {}
+        for index, entry in self.dic_dict.items():
+            if entry:
+                indices = word_index.get(entry.word)
+                word_index[entry.word] = (index,) if indices is None else (*indices, index)
+        for listener in list(self.word_listeners):
+            listener.words_reset(self)
+    
+    # 反向索引和条目都通过重新赋值来修改，分片存储据此知道哪些分片需要写回
+    
+    def _index_add(self, index_str, word):
+        """将索引登记到反向索引中"""
+        indices = self.word_index.get(word, ())
+        if index_str not in indices:
+            self.word_index[word] = (*indices, index_str)
+            if not indices:
+                for listener in list(self.word_listeners):
+                    listener.word_added(self, word)
+    
+    def _index_remove(self, index_str, word):
+        """从反向索引中移除索引"""
+        indices = self.word_index.get(word)
+        if indices and index_str in indices:
+            indices = tuple(i for i in indices if i != index_str)
+            if indices:
+                self.word_index[word] = indices
+            else:
+                del self.word_index[word]
+                for listener in list(self.word_listeners):
+                    listener.word_removed(self, word)
     
     def word2index(self, word):
         """根据词查找对应的索引"""
-        for index, items in self.dic_dict.items():
-            # 假设列表的第一个元素是词本身
-            if items and items[0] == word:
-                return index
+        indices = self.word_index.get(word)
+        if indices:
+            # 同一个词有多个索引时返回第一个
+            return indices[0]
         return None
     
+    def word2indices(self, word):
+        """根据词查找所有对应的索引"""
+        return list(self.word_index.get(word, ()))
+    
     def index2word(self, index):
-        """根据索引返回词（列表的第一个元素）"""
-        index_str = str(index)
-        if index_str in self.dic_dict and self.dic_dict[index_str]:
-            return self.dic_dict[index_str][0]  # 返回词本身
+        """根据索引返回词"""
+        entry = self.dic_dict.get(str(index))
+        if entry:
+            return entry.word
         return None
     
     def get_definitions(self, word):
-        """获取词的定义（列表中除第一个元素外的所有元素）"""
+        """获取词的定义（列表中除第一个元素外的所有元素，每次返回新的列表）"""
         index = self.word2index(word)
         if index is not None:
-            items = self.dic_dict[index]
-            if len(items) > 1:
-                return items[1:]  # 返回定义列表
-            return []  # 没有定义
+            return list(self.dic_dict[index].items)  # 没有定义时是空列表
         return None
     
     def set_a_word(self, word, index, definitions=None, save=False):
@@ -45,27 +110,31 @@ class DicTable:
         
         index_str = str(index)
         
-        # 构建词条：第一个元素是词本身，后面是定义
-        entry = [word] + definitions
+        entry = Entry(word, definitions)
+        
+        self._remember(index_str)
         
         # 检查索引是否已存在
         if index_str in self.dic_dict:
             # 如果索引存在，可以选择覆盖或合并
             print(f"警告：索引 {index} 已存在，将覆盖原有内容")
+            if self.dic_dict[index_str]:
+                self._index_remove(index_str, self.dic_dict[index_str].word)
         
         self.dic_dict[index_str] = entry
+        self._index_add(index_str, word)
         
-        if save:
-            self.save()
+        self._persist(save, index_str)
     
     def add_definition(self, word, definition, save=False):
         """为指定词添加一个新的定义"""
         index = self.word2index(word)
         if index is not None:
-            if definition not in self.dic_dict[index]:
-                self.dic_dict[index].append(definition)
-                if save:
-                    self.save()
+            entry = self.dic_dict[index]
+            if definition != entry.word and definition not in entry.items:
+                self._remember(index)
+                self.dic_dict[index] = Entry(entry.word, entry.items + (definition,))
+                self._persist(save, index)
                 return True
         return False
     
@@ -73,11 +142,12 @@ class DicTable:
         """更新词的名称（保持索引和定义不变）"""
         index = self.word2index(old_word)
         if index is not None:
-            # 替换第一个元素（词本身）
-            definitions = self.dic_dict[index][1:]
-            self.dic_dict[index] = [new_word] + definitions
-            if save:
-                self.save()
+            self._remember(index)
+            # 只替换词本身，定义元组直接共享
+            self.dic_dict[index] = Entry(new_word, self.dic_dict[index].items)
+            self._index_remove(index, old_word)
+            self._index_add(index, new_word)
+            self._persist(save, index)
             return True
         return False
     
@@ -85,31 +155,82 @@ class DicTable:
         """删除一个词及其所有定义"""
         index = self.word2index(word)
         if index is not None:
+            self._remember(index)
             del self.dic_dict[index]
-            if save:
-                self.save()
+            self._index_remove(index, word)
+            self._persist(save, index)
             return True
         return False
     
+    def entries(self):
+        """按表中顺序遍历 (索引, 条目)（分片模式下是全表扫描）"""
+        return self.dic_dict.items()
+    
     def get_all_words(self):
-        """获取所有词"""
+        """获取所有词（分片模式下是全表扫描，依次读取所有分片）"""
         words = []
-        for items in self.dic_dict.values():
-            if items:  # 确保列表不为空
-                words.append(items[0])  # 只添加词本身
+        for entry in self.dic_dict.values():
+            if entry:  # 跳过空条目
+                words.append(entry.word)
         return words
     
+    def _remember(self, *path):
+        """批量修改中保存即将被修改的键的原内容"""
+        self.change_log.remember(self.dic_dict, list(path))
+    
+    def _persist(self, save, *path):
+        """把一次修改追加到变更日志（O(1) 写入）；save 为假时留到下一次写入，批量修改中推迟到退出时写入"""
+        # 每次修改都会经过这里，顺便递增版本号，依赖词表的缓存据此失效
+        self.version += 1
+        self.change_log.record(self.dic_dict, list(path), save)
+    
+    @contextlib.contextmanager
+    def batch(self, save=True):
+        """批量修改：退出时一次性写入变更日志，发生异常时回滚所有修改
+        
+        Args:
+            save: 退出时是否写入文件
+        """
+        self.change_log.begin()
+        try:
+            yield self
+        except BaseException:
+            restored = self.change_log.rollback(self.dic_dict)
+            self.version += 1
+            # 只修正被回滚的条目在反向索引中的登记
+            for (index,), discarded in restored or ():
+                if discarded:
+                    self._index_remove(index, discarded.word)
+                entry = self.dic_dict.get(index)
+                if entry:
+                    self._index_add(index, entry.word)
+            raise
+        else:
+            self.change_log.commit(self.dic_dict, save)
+    
+    def copy(self):
+        """复制一份可以独立修改的词表
+        
+        条目不可变，只复制条目字典和反向索引本身；变更日志写入同一个文件，
+        但有自己的批量修改状态（见 ChangeLog.copy），word_listeners 不继承。
+        """
+        if not isinstance(self.dic_dict, dict):
+            raise ValueError("分片存储的词表不能复制")
+        table = copy.copy(self)
+        table.dic_dict = dict(self.dic_dict)
+        table.word_index = dict(self.word_index)
+        table.word_listeners = weakref.WeakSet()
+        table.change_log = self.change_log.copy()
+        return table
+    
     def save(self):
-        """保存数据到文件"""
-        with open(self.json_file, 'w', encoding='utf-8') as f:
-            json.dump(self.dic_dict, f, indent=4, ensure_ascii=False)
+        """保存数据到文件（原子地重写完整快照并清空变更日志）"""
+        self.change_log.compact(self.dic_dict)
     
     def __str__(self):
         """字符串表示"""
         result = "词表内容：\n"
-        for index, items in self.dic_dict.items():
-            if items:
-                word = items[0]
-                definitions = items[1:] if len(items) > 1 else []
-                result += f"索引 {index}: {word} -> 定义: {definitions}\n"
+        for index, entry in self.dic_dict.items():
+            if entry:
+                result += f"索引 {index}: {entry.word} -> 定义: {list(entry.items)}\n"
         return result
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""考虑词序和权重的语法规则匹配
+
+get_grammars 只统计规则与句子共有的词性数量，不考虑顺序。规则本身是有序的词性序列，
+这里把句子与规则做保序对齐：句子中的词按顺序与规则中的词性一一对应（词的词性中
+包含该词性即可对应），每个词、每个规则位置最多使用一次，得分是对应上的词性的权重之和
+（加权最长公共子序列）。
+
+所有规则预先合并成一棵前缀树（规则组间共享相同的前缀），对齐时沿前缀树做一次
+动态规划：每个节点保存“规则前缀 × 句子前缀”的最优得分行，子节点由父节点的行推出，
+共享前缀只计算一次；句子中没有出现的词性直接复用父节点的行。每个节点还记录其下方
+剩余词性的最大权重和，已经不可能进入前 k 名的子树整体跳过。
+"""
+
+import heapq
+
+
+def check_weights(weights=None, default_weight=1.0):
+    """确认所有权重都不是负数
+
+    前缀树上的剪枝以“剩余词性的权重和”作为得分上界，只有权重非负时才成立；
+    负权重会让上界偏小而错误地跳过子树。
+    """
+    for feature, weight in (weights or {}).items():
+        if weight < 0:
+            raise ValueError(f"词性 {feature} 的权重不能为负数：{weight}")
+    if default_weight < 0:
+        raise ValueError(f"默认权重不能为负数：{default_weight}")
+
+
+class GrammarAligner:
+    """在 GrammarTable 的全部规则上做保序、加权的对齐
+
+    Args:
+        grammar_table: 提供规则的 GrammarTable
+        weights: {词性: 权重}，未列出的词性权重为 default_weight；权重不能为负数
+        default_weight: 默认权重
+    """
+
+    def __init__(self, grammar_table, weights=None, default_weight=1.0):
+        check_weights(weights, default_weight)
+        self.grammar_table = grammar_table
+        self.weights = dict(weights or {})
+        self.default_weight = default_weight
+        self._version = None
+
+    def bind(self, grammar_table):
+        """为共享同一批规则的语法表（见 GrammarTable.bind）创建对齐引擎，已编译的前缀树直接共享"""
+        aligner = GrammarAligner(grammar_table, self.weights, self.default_weight)
+        if self._version is not None:
+            aligner._root = self._root
+            aligner._version = self._version
+        return aligner
+
+    def weight(self, feature):
+        """词性的权重"""
+        return self.weights.get(feature, self.default_weight)
+
+    def _build(self):
+        """把所有规则编译成前缀树
+
+        节点是列表 [子节点, 结束于此的规则键, 自身词性的权重, 上界]，
+        上界是从该节点起向下任意一条路径的最大权重和；建好后子节点是
+        [(位号, 子节点), ...]，按上界从大到小排列。
+        """
+        table = self.grammar_table
+        root = [{}, [], 0.0, 0.0]
+        for rule_name, rule_data in table.compiled_rules.items():
+            for index, rule_types in rule_data.items():
+                node = root
+                for feature in rule_types:
+                    bit = table._feature_bit(feature)
+                    child = node[0].get(bit)
+                    if child is None:
+                        child = node[0][bit] = [{}, [], self.weight(feature), 0.0]
+                    node = child
+                node[1].append((rule_name, index))
+
+        # 后序遍历：子节点先于父节点计算上界
+        stack = [(root, False)]
+        while stack:
+            node, expanded = stack.pop()
+            if not expanded:
+                stack.append((node, True))
+                stack.extend((child, False) for child in node[0].values())
+                continue
+            children = sorted(node[0].items(), key=lambda item: -item[1][3])
+            node[0] = children
+            node[3] = node[2] + (children[0][1][3] if children else 0.0)
+        self._root = root
+        self._version = table.version
+
+    def _ensure_built(self):
+        """语法表发生修改（version 变化）后重新编译前缀树"""
+        if self._version != self.grammar_table.version:
+            self._build()
+
+    def _word_bits(self, words):
+        """句子中有词性的词：[(在 words 中的位置, 词, 词性元组, 位号集合), ...]"""
+        table = self.grammar_table
+        word_types = table._get_words_types(words)
+        typed = []
+        position = 0
+        for wt in word_types:
+            # _get_words_types 按顺序跳过没有词性的词，依次找回每个词的位置
+            while words[position] != wt['word']:
+                position += 1
+            typed.append((
+                position, wt['word'], wt['types'],
+                {table._feature_bit(t) for t in wt['types']}
+            ))
+            position += 1
+        return typed
+
+    def align(self, words, k=10, min_score=1.0):
+        """返回与句子对齐得分最高的 k 条规则
+
+        Args:
+            words: 词列表
+            k: 返回的规则数量
+            min_score: 最低得分
+
+        Returns:
+            按得分从高到低（相同时按规则在表中的顺序）排列的
+            [{'rule_name', 'index', 'score', 'rule_types', 'alignment'}, ...]，
+            alignment 是 [{'word', 'position', 'rule_position', 'type'}, ...]
+        """
+        if words is None or k <= 0:
+            return []
+        self._ensure_built()
+
+        typed = self._word_bits(words)
+        if not typed:
+            return []
+
+        n = len(typed)
+        positions = {}
+        for i, (_, _, _, bits) in enumerate(typed, 1):
+            for bit in bits:
+                positions.setdefault(bit, []).append(i)
+
+        rule_order = self.grammar_table._rule_order
+        heap = []
+        stack = [(self._root, [0.0] * (n + 1))]
+        while stack:
+            node, row = stack.pop()
+            score = row[n]
+            for key in node[1]:
+                if score < min_score:
+                    break
+                group_ord, idx_ord = rule_order[key]
+                item = (score, (-group_ord, -idx_ord), key)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+
+            # 逆序入栈，上界大的子树先处理，尽早抬高第 k 名的得分
+            for bit, child in reversed(node[0]):
+                bound = score + child[3]
+                if bound < min_score or (len(heap) >= k and bound < heap[0][0]):
+                    continue
+                hits = positions.get(bit)
+                if hits is None:
+                    # 句子中没有这个词性，得分行与父节点相同
+                    stack.append((child, row))
+                    continue
+                weight = child[2]
+                new_row = row[:]
+                for i in range(hits[0], n + 1):
+                    best = new_row[i - 1]
+                    if row[i] > best:
+                        best = row[i]
+                    if bit in typed[i - 1][3]:
+                        candidate = row[i - 1] + weight
+                        if candidate > best:
+                            best = candidate
+                    new_row[i] = best
+                stack.append((child, new_row))
+
+        heap.sort(reverse=True)
+        return [self._result(key, score, typed) for score, _, key in heap]
+
+    def _result(self, key, score, typed):
+        """为入选的规则单独计算完整的对齐矩阵并回溯出对应关系"""
+        table = self.grammar_table
+        rule_name, index = key
+        rule_types = table.compiled_rules[rule_name][index]
+        bits = [table._feature_bit(t) for t in rule_types]
+        weights = [self.weight(t) for t in rule_types]
+        m, n = len(rule_types), len(typed)
+
+        dp = [[0.0] * (n + 1) for _ in range(m + 1)]
+        for j in range(1, m + 1):
+            previous, current = dp[j - 1], dp[j]
+            for i in range(1, n + 1):
+                best = max(current[i - 1], previous[i])
+                if bits[j - 1] in typed[i - 1][3]:
+                    best = max(best, previous[i - 1] + weights[j - 1])
+                current[i] = best
+
+        alignment = []
+        j, i = m, n
+        while j > 0 and i > 0:
+            if dp[j][i] == dp[j - 1][i]:
+                j -= 1
+            elif dp[j][i] == dp[j][i - 1]:
+                i -= 1
+            else:
+                position, word, _, _ = typed[i - 1]
+                alignment.append({
+                    'word': word,
+                    'position': position,
+                    'rule_position': j - 1,
+                    'type': rule_types[j - 1]
+                })
+                j -= 1
+                i -= 1
+        alignment.reverse()
+
+        return {
+            'rule_name': rule_name,
+            'index': index,
+            'score': score,
+            'rule_types': list(rule_types),
+            'alignment': alignment
+        }
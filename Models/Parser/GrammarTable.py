@@ -1,13 +1,38 @@
+import collections
+import contextlib
+import copy
+import heapq
 import json
 import enum
+import threading
+from Models.Parser.ChangeLog import ChangeLog
 from Models.Parser.DicTable import DicTable
+from Models.Parser.Records import Rule, paused_gc
 from Models.Parser.DefParser import DefinitionType, MoodType, TenseType, OtherType
+from Models.Parser.DefParser import FAMILY_CODES, FEATURE_ORDINALS, NAME_TABLES, decode_value
 
 class GrammarTable:
-    def __init__(self, json_file='grammars.json'):
+    def __init__(self, json_file='grammars.json', dic_table=None, data=None):
+        """
+        Args:
+            json_file: 表文件路径（保存时写入该文件）
+            dic_table: 共享的词表；未注入时在第一次使用时加载一次
+            data: 已加载的表数据（例如来自二进制快照），提供时不再读取 json_file
+        """
         self.json_file = json_file
-        with open(json_file, 'r', encoding='utf-8') as f:
-            self.grammar_dict = json.load(f)
+        self._dic_table = dic_table
+        self.change_log = ChangeLog(json_file)
+        with paused_gc():
+            if data is None:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                # 重放上次压缩之后追加的修改
+                self.change_log.replay(data)
+            # 只含内置词性的规则打包为 Rule（全局编码元组）
+            for rule_data in data.values():
+                for index, type_indices in rule_data.items():
+                    rule_data[index] = Rule.from_json(type_indices)
+        self.grammar_dict = data
         
         # 词性类型映射
         self.type_mapping = {
@@ -16,6 +41,93 @@ class GrammarTable:
             'TenseType': TenseType,
             'OtherType': OtherType
         }
+        
+        # 词性 -> 位号，四类枚举共用一个位空间（共 66 个成员）
+        self._feature_bits = dict(FEATURE_ORDINALS)
+        
+        # get_grammars 的结果缓存：(词集合, min_match) -> ([(规则键, 匹配数量), ...], {词: 词性})
+        # 服务的工作线程并发查询同一张表，缓存的读写都在 _cache_lock 内进行
+        self.cache_size = 4096
+        self._result_cache = collections.OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._cache_version = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.version = 0
+        
+        # 预编译的规则缓存：rule_name -> {index: 词性元组}
+        # 以及倒排索引：词性 -> {(rule_name, index): 出现次数}
+        with paused_gc():
+            self._compile_rules()
+    
+    def _compile_rules(self):
+        """将所有规则一次性转换为不可变的词性元组，并建立倒排索引"""
+        self.compiled_rules = {}
+        self.type_postings = {}
+        # 规则的顺序号 (规则组序号, 组内序号)，用于保持与遍历顺序一致的排序
+        self._rule_order = {}
+        self._group_order = {}
+        # 规则的词性位图，以及含重复词性的规则的 {位号: 次数}
+        self._rule_masks = {}
+        self._rule_multiplicities = {}
+        # 规则的词性数量（匹配数量的上限）
+        self._rule_lengths = {}
+        # 词表索引 -> 给该词标注词性的规则键（包含该索引的第一个规则组）
+        self._index_rules = {}
+        for rule_name, rule_data in self.grammar_dict.items():
+            # 空的规则组也要登记，保证规则组的顺序与 grammar_dict 一致
+            self.compiled_rules[rule_name] = {}
+            self._group_order[rule_name] = len(self._group_order)
+            for index, type_indices in rule_data.items():
+                self._set_compiled_rule(rule_name, index, self._rule_types(type_indices))
+    
+    def _set_compiled_rule(self, rule_name, index, rule_types):
+        """登记（或替换）一条编译后的规则，同时维护倒排索引"""
+        self.version += 1
+        key = (rule_name, index)
+        group = self.compiled_rules.get(rule_name)
+        if group is None:
+            group = self.compiled_rules[rule_name] = {}
+            self._group_order[rule_name] = len(self._group_order)
+        
+        if index in group:
+            # 替换已有规则：先从倒排索引中撤下旧的词性
+            for rule_type in set(group[index]):
+                postings = self.type_postings.get(rule_type)
+                if postings is not None:
+                    postings.pop(key, None)
+                    if not postings:
+                        del self.type_postings[rule_type]
+        else:
+            self._rule_order[key] = (self._group_order[rule_name], len(group))
+            # 同一个索引出现在多个规则组中时，以排在最前的规则组为准
+            current = self._index_rules.get(index)
+            if current is None or self._group_order[rule_name] < self._group_order[current[0]]:
+                self._index_rules[index] = key
+        
+        group[index] = rule_types
+        mask = 0
+        multiplicities = {}
+        for rule_type in set(rule_types):
+            count = rule_types.count(rule_type)
+            self.type_postings.setdefault(rule_type, {})[key] = count
+            bit = self._feature_bit(rule_type)
+            mask |= 1 << bit
+            if count > 1:
+                multiplicities[bit] = count
+        self._rule_masks[key] = mask
+        self._rule_lengths[key] = len(rule_types)
+        if multiplicities:
+            self._rule_multiplicities[key] = multiplicities
+        else:
+            self._rule_multiplicities.pop(key, None)
+    
+    def _feature_bit(self, feature):
+        """获取词性对应的位号，非枚举词性在第一次出现时分配新的位号"""
+        bit = self._feature_bits.get(feature)
+        if bit is None:
+            bit = self._feature_bits[feature] = len(self._feature_bits)
+        return bit
     
     def get_grammars(self, words=None, min_match=5):
         """根据一组词获取匹配的语法规则
@@ -30,62 +142,273 @@ class GrammarTable:
         if words is None:
             words = []
         
-        # 获取每个词的词性
-        word_types = self._get_words_types(words)
+        # 先查结果缓存，未命中时才获取每个词的词性
+        ranking, word_types = self._rank_rules(words, min_match)
         
         if not word_types:
             return []
         
-        matched_grammars = []
+        return self._materialize(ranking, word_types)
+    
+    def get_top_grammars(self, words=None, k=10, min_match=5):
+        """获取匹配数量最多的 k 条语法规则
         
-        # 遍历所有语法规则
-        for rule_name, rule_data in self.grammar_dict.items():
-            # 规则数据格式：index: [词性index1, 词性index2, ...]
-            for index, type_indices in rule_data.items():
-                # 转换词性索引为实际词性值
-                rule_types = self._convert_type_indices(type_indices)
-                
-                # 计算匹配数量
-                match_count = self._count_matches(word_types, rule_types)
-                
-                if match_count >= min_match:
-                    matched_grammars.append({
-                        'rule_name': rule_name,
-                        'index': index,
-                        'match_count': match_count,
-                        'rule_types': rule_types,
-                        'matched_words': self._get_matched_words(word_types, rule_types)
-                    })
+        结果与 get_grammars(words, min_match)[:k] 相同，但不会为所有规则打分：
+        规则的词性数量是其匹配数量的上限，候选规则按词性数量从多到少分桶处理，
+        剩余的规则不可能进入前 k 名时提前结束。matched_words 只为最终入选的规则计算。
+        
+        Args:
+            words: 词列表
+            k: 返回的规则数量
+            min_match: 最小匹配词性数量（默认5）
+        """
+        if words is None:
+            words = []
+        
+        if k <= 0:
+            return []
         
-        # 按匹配数量排序
-        matched_grammars.sort(key=lambda x: x['match_count'], reverse=True)
+        # 已经缓存了完整排名时直接截取，也不需要再获取词性
+        cached = self._cache_get((frozenset(words), min_match), count=False)
+        if cached is not None:
+            ranking, typed = cached
+            word_types = [typed[word] for word in words if word in typed]
+        else:
+            word_types = self._get_words_types(words)
+            ranking = self._top_rules(word_types, k, min_match) if word_types else []
+        
+        if not word_types:
+            return []
+        
+        return self._materialize(ranking[:k], word_types)
+    
+    def _top_rules(self, word_types, k, min_match):
+        """用大小为 k 的堆选出排名前 k 的规则，按词性数量上限剪枝"""
+        word_mask = 0
+        word_type_values = set()
+        for wt in word_types:
+            word_mask |= wt['mask']
+            word_type_values.update(wt['types'])
+        
+        # 候选规则按词性数量分桶，词性数量达不到 min_match 的规则直接跳过
+        rule_lengths = self._rule_lengths
+        buckets = {}
+        if min_match <= 0:
+            candidates = self._rule_order
+        else:
+            candidates = set()
+            for word_type in word_type_values:
+                postings = self.type_postings.get(word_type)
+                if postings:
+                    candidates.update(postings)
+        for key in candidates:
+            length = rule_lengths[key]
+            if length >= min_match:
+                buckets.setdefault(length, []).append(key)
+        
+        # 堆顶是当前第 k 名：匹配数量最少、数量相同时在表中最靠后的规则
+        heap = []
+        rule_masks = self._rule_masks
+        rule_multiplicities = self._rule_multiplicities
+        rule_order = self._rule_order
+        for length in sorted(buckets, reverse=True):
+            if len(heap) >= k and length < heap[0][0]:
+                # 剩余规则的匹配数量都不可能超过第 k 名
+                break
+            for key in buckets[length]:
+                common = rule_masks[key] & word_mask
+                match_count = common.bit_count()
+                multiplicities = rule_multiplicities.get(key)
+                if multiplicities:
+                    for bit, count in multiplicities.items():
+                        if common >> bit & 1:
+                            match_count += count - 1
+                if match_count < min_match:
+                    continue
+                group_ord, idx_ord = rule_order[key]
+                item = (match_count, (-group_ord, -idx_ord), key)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item > heap[0]:
+                    heapq.heapreplace(heap, item)
+        
+        heap.sort(reverse=True)
+        return [(key, match_count) for match_count, _, key in heap]
+    
+    def _materialize(self, ranking, word_types):
+        """把 [(规则键, 匹配数量), ...] 转换为结果字典列表"""
+        matched_grammars = []
+        for key, match_count in ranking:
+            rule_name, index = key
+            matched_grammars.append({
+                'rule_name': rule_name,
+                'index': index,
+                'match_count': match_count,
+                'rule_types': list(self.compiled_rules[rule_name][index]),
+                'matched_words': self._get_matched_words(word_types, self._rule_masks[key])
+            })
         
         return matched_grammars
     
+    def _rank_rules(self, words, min_match):
+        """计算达到 min_match 的规则及其匹配数量（带 LRU 缓存）
+        
+        匹配数量和每个词的词性只取决于输入中出现了哪些词，与顺序和重复无关，
+        因此以词的集合作为缓存键；缓存中同时保存每个词的词性，
+        命中时不再查询词表，按输入的顺序取回即可。
+        
+        Returns:
+            (排名 [(规则键, 匹配数量), ...], 与 _get_words_types(words) 相同的词性列表)
+        """
+        version = self._table_versions()
+        cache_key = (frozenset(words), min_match)
+        cached = self._cache_get(cache_key, version)
+        if cached is not None:
+            ranking, typed = cached
+            return ranking, [typed[word] for word in words if word in typed]
+        
+        word_types = self._get_words_types(words)
+        ranking = []
+        if word_types:
+            # 通过倒排索引只累计与输入至少共享一个词性的规则
+            match_counts = self._count_candidate_matches(word_types, min_match)
+            ranking = [
+                (key, match_count) for key, match_count in match_counts.items()
+                if match_count >= min_match
+            ]
+            # 按匹配数量排序，数量相同时保持规则在表中的顺序
+            ranking.sort(key=lambda item: (-item[1], self._rule_order[item[0]]))
+        
+        self._cache_put(cache_key, version, (ranking, {wt['word']: wt for wt in word_types}))
+        return ranking, word_types
+    
+    def _table_versions(self):
+        """结果缓存所依赖的 (语法表版本, 词表版本)"""
+        return (self.version, getattr(self.dic_table, 'version', 0))
+    
+    def _cache_get(self, cache_key, version=None, count=True):
+        """查找结果缓存，未命中时返回 None
+        
+        语法表或词表发生了修改（版本变化）时缓存全部失效。
+        count 为假时只查看，不计入命中统计，也不调整 LRU 顺序。
+        """
+        if version is None:
+            version = self._table_versions()
+        with self._cache_lock:
+            if self._cache_version != version:
+                self._result_cache.clear()
+                self._cache_version = version
+            value = self._result_cache.get(cache_key)
+            if count:
+                if value is None:
+                    self.cache_misses += 1
+                else:
+                    self._result_cache.move_to_end(cache_key)
+                    self.cache_hits += 1
+            return value
+    
+    def _cache_put(self, cache_key, version, value):
+        """登记查找时版本下计算出的结果；期间表已经被修改时不登记"""
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            if self._cache_version != version:
+                return
+            self._result_cache[cache_key] = value
+            self._result_cache.move_to_end(cache_key)
+            while len(self._result_cache) > self.cache_size:
+                self._result_cache.popitem(last=False)
+    
+    def cache_info(self):
+        """结果缓存的命中统计"""
+        with self._cache_lock:
+            return {
+                'hits': self.cache_hits,
+                'misses': self.cache_misses,
+                'size': len(self._result_cache),
+                'max_size': self.cache_size
+            }
+    
+    def clear_cache(self):
+        """清空结果缓存"""
+        with self._cache_lock:
+            self._result_cache.clear()
+    
+    def _count_candidate_matches(self, word_types, min_match):
+        """利用倒排索引选出候选规则，再用位图批量计算匹配数量"""
+        word_mask = 0
+        word_type_values = set()
+        for wt in word_types:
+            word_mask |= wt['mask']
+            word_type_values.update(wt['types'])
+        
+        if min_match <= 0:
+            # 匹配数为 0 的规则也满足条件，需要包含全部规则
+            candidates = self._rule_order
+        else:
+            candidates = set()
+            for word_type in word_type_values:
+                postings = self.type_postings.get(word_type)
+                if postings:
+                    candidates.update(postings)
+        
+        match_counts = {}
+        rule_masks = self._rule_masks
+        rule_multiplicities = self._rule_multiplicities
+        for key in candidates:
+            common = rule_masks[key] & word_mask
+            match_count = common.bit_count()
+            multiplicities = rule_multiplicities.get(key)
+            if multiplicities:
+                # 规则中重复出现的词性按出现次数计数
+                for bit, count in multiplicities.items():
+                    if common >> bit & 1:
+                        match_count += count - 1
+            match_counts[key] = match_count
+        
+        return match_counts
+    
+    @property
+    def dic_table(self):
+        """获取共享的词表实例"""
+        if self._dic_table is None:
+            self._dic_table = DicTable()
+        return self._dic_table
+    
+    @dic_table.setter
+    def dic_table(self, dic_table):
+        self._dic_table = dic_table
+    
     def _get_words_types(self, words):
         """获取一组词的词性"""
-        dic_table = DicTable()
+        dic_table = self.dic_table
         word_types = []
         
+        index_rules = self._index_rules
         for word in words:
             # 从 DicTable 获取词的索引
             index = dic_table.word2index(word)
             if index:
-                # 从 grammar_dict 中查找该索引对应的词性
-                for rule_name, rule_data in self.grammar_dict.items():
-                    if index in rule_data:
-                        type_indices = rule_data[index]
-                        converted_types = self._convert_type_indices(type_indices)
-                        word_types.append({
-                            'word': word,
-                            'index': index,
-                            'types': converted_types,
-                            'raw_types': type_indices
-                        })
-                        break
+                # 直接查出标注该索引的规则，与规则组的数量无关
+                key = index_rules.get(index)
+                if key is not None:
+                    rule_name = key[0]
+                    word_types.append({
+                        'word': word,
+                        'index': index,
+                        'types': list(self.compiled_rules[rule_name][index]),
+                        'raw_types': self.grammar_dict[rule_name][index],
+                        'mask': self._rule_masks[key]
+                    })
         
         return word_types
     
+    def _rule_types(self, type_indices):
+        """规则的词性枚举元组；打包的规则直接按编码查表"""
+        if isinstance(type_indices, Rule):
+            return type_indices.features()
+        return tuple(self._convert_type_indices(type_indices))
+    
     def _convert_type_indices(self, type_indices):
         """转换词性索引为实际的词性枚举值"""
         converted = []
@@ -99,7 +422,15 @@ class GrammarTable:
                 
                 if type_class and value:
                     type_enum = self.type_mapping.get(type_class)
-                    if type_enum:
+                    if type_enum in FAMILY_CODES:
+                        # 内置的四类词性：直接查预计算的解码表
+                        member = decode_value(type_enum, value)
+                        if member is None and isinstance(value, str):
+                            # 如果值无效，尝试从字符串转换
+                            member = NAME_TABLES[type_enum].get(value)
+                        if member is not None:
+                            converted.append(member)
+                    elif type_enum:
                         try:
                             converted.append(type_enum(value))
                         except ValueError:
@@ -117,28 +448,16 @@ class GrammarTable:
         
         return converted
     
-    def _count_matches(self, word_types, rule_types):
-        """计算词性和规则词性的匹配数量"""
-        match_count = 0
-        
-        # 获取所有词的词性列表
-        word_type_values = []
-        for wt in word_types:
-            word_type_values.extend(wt['types'])
-        
-        # 计算匹配
-        for rule_type in rule_types:
-            if rule_type in word_type_values:
-                match_count += 1
-        
-        return match_count
-    
-    def _get_matched_words(self, word_types, rule_types):
+    def _get_matched_words(self, word_types, rule_mask):
         """获取匹配了哪些词"""
         matched = []
         
         for wt in word_types:
-            matched_types = [t for t in wt['types'] if t in rule_types]
+            if not wt['mask'] & rule_mask:
+                continue
+            matched_types = [
+                t for t in wt['types'] if rule_mask >> self._feature_bits[t] & 1
+            ]
             if matched_types:
                 matched.append({
                     'word': wt['word'],
@@ -157,43 +476,74 @@ class GrammarTable:
             save: 是否保存
         """
         if rule_name not in self.grammar_dict:
+            # 新建规则组时同时记下规则组本身，回滚时一并删除
+            self._remember(rule_name)
             self.grammar_dict[rule_name] = {}
+        self._remember(rule_name, index)
         
         # 转换词性为可存储格式
-        stored_types = []
-        for t in type_list:
-            if isinstance(t, enum.Enum):
-                # 从枚举值获取类型名和值
-                type_class = t.__class__.__name__
-                stored_types.append({
-                    'type': type_class,
-                    'value': t.value
-                })
-            elif isinstance(t, dict):
-                # 已经是正确格式
-                stored_types.append(t)
-            else:
-                # 其他格式，直接存储
-                stored_types.append(t)
+        stored_types = Rule.from_json([self.type_to_json(t) for t in type_list])
         
         self.grammar_dict[rule_name][index] = stored_types
+        # 只重新编译被修改的这一条规则
+        self._set_compiled_rule(rule_name, index, self._rule_types(stored_types))
         
-        if save:
-            self.save()
+        self._persist(save, rule_name, index)
         
         return True
     
+    @staticmethod
+    def type_to_json(t):
+        """把词性转换为可存储的 JSON 格式"""
+        if isinstance(t, enum.Enum):
+            # 从枚举值获取类型名和值
+            return {
+                'type': t.__class__.__name__,
+                'value': t.value
+            }
+        # 字典已经是正确格式，其他格式直接存储
+        return t
+    
+    @classmethod
+    def grammars_to_json(cls, matched_grammars):
+        """把 get_grammars 的结果转换为可 JSON 序列化的格式"""
+        return [
+            {
+                'rule_name': grammar['rule_name'],
+                'index': grammar['index'],
+                'match_count': grammar['match_count'],
+                'rule_types': [cls.type_to_json(t) for t in grammar['rule_types']],
+                'matched_words': [
+                    {
+                        'word': matched['word'],
+                        'matched_types': [cls.type_to_json(t) for t in matched['matched_types']]
+                    }
+                    for matched in grammar['matched_words']
+                ]
+            }
+            for grammar in matched_grammars
+        ]
+    
     def get_rule_by_index(self, rule_name, index):
         """根据规则名和索引获取词性列表"""
-        if rule_name in self.grammar_dict:
-            if index in self.grammar_dict[rule_name]:
-                type_indices = self.grammar_dict[rule_name][index]
-                return self._convert_type_indices(type_indices)
+        if rule_name in self.compiled_rules:
+            if index in self.compiled_rules[rule_name]:
+                return list(self.compiled_rules[rule_name][index])
         return None
     
     def get_all_rules(self):
-        """获取所有规则"""
-        return self.grammar_dict
+        """获取所有规则
+        
+        返回 JSON 格式（词性字典列表）的 {rule_name: {index: 词性列表}} 副本；
+        表内部的规则是打包的 Rule，修改返回值不会影响表。
+        """
+        return {
+            rule_name: {
+                index: rule.to_json() if isinstance(rule, Rule) else rule
+                for index, rule in rules.items()
+            }
+            for rule_name, rules in self.grammar_dict.items()
+        }
     
     def find_rules_by_type(self, target_type, min_count=1):
         """根据特定词性查找包含该词性的规则
@@ -204,25 +554,91 @@ class GrammarTable:
         """
         results = []
         
-        for rule_name, rule_data in self.grammar_dict.items():
-            for index, type_indices in rule_data.items():
-                converted = self._convert_type_indices(type_indices)
-                count = converted.count(target_type)
-                
-                if count >= min_count:
+        if min_count <= 0:
+            # 不包含该词性的规则也满足条件，只能遍历全部规则
+            for rule_name, rule_data in self.compiled_rules.items():
+                for index, converted in rule_data.items():
                     results.append({
                         'rule_name': rule_name,
                         'index': index,
-                        'count': count,
-                        'types': converted
+                        'count': converted.count(target_type),
+                        'types': list(converted)
                     })
+            return results
+        
+        postings = self.type_postings.get(target_type, {})
+        for key in sorted(postings, key=self._rule_order.__getitem__):
+            count = postings[key]
+            if count >= min_count:
+                rule_name, index = key
+                results.append({
+                    'rule_name': rule_name,
+                    'index': index,
+                    'count': count,
+                    'types': list(self.compiled_rules[rule_name][index])
+                })
         
         return results
     
+    def _remember(self, *path):
+        """批量修改中保存即将被修改的键的原内容"""
+        self.change_log.remember(self.grammar_dict, list(path))
+    
+    def _persist(self, save, *path):
+        """把一次修改追加到变更日志（O(1) 写入）；save 为假时留到下一次写入，批量修改中推迟到退出时写入"""
+        self.change_log.record(self.grammar_dict, list(path), save)
+    
+    @contextlib.contextmanager
+    def batch(self, save=True):
+        """批量修改：退出时一次性写入变更日志，发生异常时回滚所有修改
+        
+        Args:
+            save: 退出时是否写入文件
+        """
+        self.change_log.begin()
+        try:
+            yield self
+        except BaseException:
+            if self.change_log.rollback(self.grammar_dict) is not None:
+                self._compile_rules()
+            raise
+        else:
+            self.change_log.commit(self.grammar_dict, save)
+    
+    def bind(self, dic_table):
+        """共享全部规则数据、改用另一个词表的语法表（例如词表被复制之后）
+        
+        不能通过返回的表修改规则：规则数据与原表共享。变更日志有自己的状态
+        （见 ChangeLog.copy），结果缓存（及其锁）重新开始。
+        """
+        table = copy.copy(self)
+        table.dic_table = dic_table
+        table.change_log = self.change_log.copy()
+        table._result_cache = collections.OrderedDict()
+        table._cache_lock = threading.Lock()
+        table._cache_version = None
+        table.cache_hits = 0
+        table.cache_misses = 0
+        return table
+    
+    def copy(self):
+        """复制一份可以独立修改的语法表
+        
+        规则和编译后的词性元组不可变，只复制各层字典；词表与原表共享，
+        其余与 bind() 相同。
+        """
+        table = self.bind(self.dic_table)
+        table.grammar_dict = {name: dict(rules) for name, rules in self.grammar_dict.items()}
+        table.compiled_rules = {name: dict(rules) for name, rules in self.compiled_rules.items()}
+        table.type_postings = {t: dict(postings) for t, postings in self.type_postings.items()}
+        for attr in ('_feature_bits', '_rule_order', '_group_order', '_rule_masks',
+                     '_rule_multiplicities', '_rule_lengths', '_index_rules'):
+            setattr(table, attr, dict(getattr(self, attr)))
+        return table
+    
     def save(self):
-        """保存数据到文件"""
-        with open(self.json_file, 'w', encoding='utf-8') as f:
-            json.dump(self.grammar_dict, f, indent=4, ensure_ascii=False)
+        """保存数据到文件（原子地重写完整快照并清空变更日志）"""
+        self.change_log.compact(self.grammar_dict)
     
     def __str__(self):
         """字符串表示"""
@@ -230,10 +646,9 @@ class GrammarTable:
             return "语法表为空"
         
         result = "语法规则：\n"
-        for rule_name, rule_data in self.grammar_dict.items():
+        for rule_name, rule_data in self.compiled_rules.items():
             result += f"\n[ {rule_name} ]\n"
-            for index, types in rule_data.items():
-                converted = self._convert_type_indices(types)
+            for index, converted in rule_data.items():
                 type_names = [str(t) for t in converted]
                 result += f"  索引 {index}: {type_names}\n"
         
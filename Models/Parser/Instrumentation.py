@@ -0,0 +1,223 @@
+"""Models.Parser 的可选性能统计
+
+默认关闭，关闭时表类上没有任何包装，调用开销为零。enable() 把热点方法
+（表加载、查询、规则打分、保存）替换为计时包装，disable() 恢复原方法。
+
+    import Models.Parser.Instrumentation as instrumentation
+    instrumentation.enable()
+    ...
+    print(instrumentation.STATS.snapshot())
+    print(instrumentation.STATS.prometheus())
+
+每个被测调用记录调用次数、累计耗时以及最近 sample_size 次耗时（用于计算分位数）。
+另外统计 get_grammars / get_top_grammars 的查询次数、结果缓存未命中次数和
+被打分的候选规则数量。
+统计只在当前进程中累计，工作进程中的调用不会汇总回父进程。
+"""
+
+import collections
+import functools
+import threading
+import time
+import Models.Parser.ActionTable
+import Models.Parser.DicTable
+import Models.Parser.GrammarTable
+import Models.Parser.MappedTables
+import Models.Parser.Snapshot
+
+# 被计时的调用：(所在对象, 属性名, 统计名)
+_TIMED_CALLS = [
+    (Models.Parser.DicTable.DicTable, '__init__', 'DicTable.load'),
+    (Models.Parser.DicTable.DicTable, 'word2index', 'DicTable.word2index'),
+    (Models.Parser.DicTable.DicTable, 'index2word', 'DicTable.index2word'),
+    (Models.Parser.DicTable.DicTable, 'get_definitions', 'DicTable.get_definitions'),
+    (Models.Parser.DicTable.DicTable, 'save', 'DicTable.save'),
+    (Models.Parser.ActionTable.ActionTable, '__init__', 'ActionTable.load'),
+    (Models.Parser.ActionTable.ActionTable, 'word2index', 'ActionTable.word2index'),
+    (Models.Parser.ActionTable.ActionTable, 'get_actions_from_word', 'ActionTable.get_actions_from_word'),
+    (Models.Parser.ActionTable.ActionTable, 'get_actions_from_index', 'ActionTable.get_actions_from_index'),
+    (Models.Parser.ActionTable.ActionTable, 'save', 'ActionTable.save'),
+    (Models.Parser.GrammarTable.GrammarTable, '__init__', 'GrammarTable.load'),
+    (Models.Parser.GrammarTable.GrammarTable, 'get_grammars', 'GrammarTable.get_grammars'),
+    (Models.Parser.GrammarTable.GrammarTable, 'get_top_grammars', 'GrammarTable.get_top_grammars'),
+    (Models.Parser.GrammarTable.GrammarTable, '_top_rules', 'GrammarTable.top_rules'),
+    (Models.Parser.GrammarTable.GrammarTable, '_get_words_types', 'GrammarTable.get_words_types'),
+    (Models.Parser.GrammarTable.GrammarTable, 'find_rules_by_type', 'GrammarTable.find_rules_by_type'),
+    (Models.Parser.GrammarTable.GrammarTable, 'save', 'GrammarTable.save'),
+    (Models.Parser.MappedTables._MappedItemsTable, 'word2index', 'MappedTable.word2index'),
+    (Models.Parser.MappedTables._MappedItemsTable, 'index2word', 'MappedTable.index2word'),
+    (Models.Parser.MappedTables.MappedDicTable, 'get_definitions', 'MappedDicTable.get_definitions'),
+    (Models.Parser.MappedTables.MappedActionTable, 'get_actions_from_word', 'MappedActionTable.get_actions_from_word'),
+    (Models.Parser.Snapshot, 'load_snapshot', 'Snapshot.load'),
+    (Models.Parser.Snapshot, 'open_snapshot', 'Snapshot.open'),
+]
+
+
+class Stats:
+    """调用耗时和计数器的汇总
+
+    Args:
+        sample_size: 每个调用保留的最近耗时样本数（计算分位数用）
+    """
+
+    QUANTILES = (0.5, 0.9, 0.99)
+
+    def __init__(self, sample_size=10000):
+        self.sample_size = sample_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """清空所有统计"""
+        with self._lock:
+            self.calls = collections.Counter()
+            self.seconds = collections.Counter()
+            self.samples = {}
+            self.counters = collections.Counter()
+
+    def record(self, name, elapsed):
+        """记录一次调用的耗时（秒）"""
+        with self._lock:
+            self.calls[name] += 1
+            self.seconds[name] += elapsed
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = collections.deque(maxlen=self.sample_size)
+            samples.append(elapsed)
+
+    def count(self, name, amount=1):
+        """增加一个计数器"""
+        with self._lock:
+            self.counters[name] += amount
+
+    @staticmethod
+    def _quantile(sorted_samples, q):
+        return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+    def snapshot(self):
+        """以字典形式返回当前统计
+
+        Returns:
+            {'calls': {名称: {'count', 'total_seconds', 'mean_seconds', 'p50', 'p90', 'p99'}},
+             'counters': {...}, 'grammar_cache_hit_rate': ..., 'rules_scored_per_query': ...}
+        """
+        with self._lock:
+            calls = {}
+            for name, count in self.calls.items():
+                samples = sorted(self.samples[name])
+                entry = {
+                    'count': count,
+                    'total_seconds': self.seconds[name],
+                    'mean_seconds': self.seconds[name] / count
+                }
+                for q in self.QUANTILES:
+                    entry[f'p{round(q * 100)}'] = self._quantile(samples, q)
+                calls[name] = entry
+            counters = dict(self.counters)
+
+        queries = counters.get('grammar_queries', 0)
+        misses = counters.get('grammar_cache_misses', 0)
+        return {
+            'calls': calls,
+            'counters': counters,
+            'grammar_cache_hit_rate': (queries - misses) / queries if queries else None,
+            'rules_scored_per_query': counters.get('rules_scored', 0) / queries if queries else None
+        }
+
+    def prometheus(self, prefix='salin'):
+        """以 Prometheus 文本格式导出统计"""
+        stats = self.snapshot()
+        lines = [
+            f'# HELP {prefix}_call_seconds Latency of instrumented Models.Parser calls.',
+            f'# TYPE {prefix}_call_seconds summary'
+        ]
+        for name, entry in sorted(stats['calls'].items()):
+            for q in self.QUANTILES:
+                value = entry[f'p{round(q * 100)}']
+                lines.append(f'{prefix}_call_seconds{{call="{name}",quantile="{q}"}} {value!r}')
+            lines.append(f'{prefix}_call_seconds_sum{{call="{name}"}} {entry["total_seconds"]!r}')
+            lines.append(f'{prefix}_call_seconds_count{{call="{name}"}} {entry["count"]}')
+        for name, value in sorted(stats['counters'].items()):
+            lines.append(f'# TYPE {prefix}_{name}_total counter')
+            lines.append(f'{prefix}_{name}_total {value}')
+        for name in ('grammar_cache_hit_rate', 'rules_scored_per_query'):
+            if stats[name] is not None:
+                lines.append(f'# TYPE {prefix}_{name} gauge')
+                lines.append(f'{prefix}_{name} {stats[name]!r}')
+        return '\n'.join(lines) + '\n'
+
+
+STATS = Stats()
+
+# 被替换的原始属性：(所在对象, 属性名) -> 原始值
+_originals = {}
+
+
+def _timed(func, name):
+    record = STATS.record
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            record(name, perf_counter() - start)
+    return wrapper
+
+
+def _counting_cache_get(func):
+    @functools.wraps(func)
+    def wrapper(self, cache_key, version=None, count=True):
+        # get_grammars 和 get_top_grammars 每次查询都恰好查找一次结果缓存，
+        # 包括没有任何词能标注词性、不需要打分的查询
+        value = func(self, cache_key, version, count)
+        STATS.count('grammar_queries')
+        if value is None:
+            STATS.count('grammar_cache_misses')
+        return value
+    return wrapper
+
+
+def _counting_candidate_matches(func):
+    record = STATS.record
+    perf_counter = time.perf_counter
+
+    @functools.wraps(func)
+    def wrapper(self, word_types, min_match):
+        start = perf_counter()
+        match_counts = func(self, word_types, min_match)
+        record('GrammarTable.score_rules', perf_counter() - start)
+        STATS.count('rules_scored', len(match_counts))
+        return match_counts
+    return wrapper
+
+
+def _patch(owner, attr, wrapper):
+    original = owner.__dict__[attr]
+    _originals[(owner, attr)] = original
+    setattr(owner, attr, wrapper(original))
+
+
+def enabled():
+    """是否已开启统计"""
+    return bool(_originals)
+
+
+def enable():
+    """开启统计（重复调用无副作用）"""
+    if _originals:
+        return
+    for owner, attr, name in _TIMED_CALLS:
+        _patch(owner, attr, lambda func, name=name: _timed(func, name))
+    grammar_table = Models.Parser.GrammarTable.GrammarTable
+    _patch(grammar_table, '_cache_get', _counting_cache_get)
+    _patch(grammar_table, '_count_candidate_matches', _counting_candidate_matches)
+
+
+def disable():
+    """关闭统计并恢复原方法（已有的统计保留）"""
+    while _originals:
+        (owner, attr), original = _originals.popitem()
+        setattr(owner, attr, original)
@@ -0,0 +1,255 @@
+"""表的 JSON Lines 批量导入 / 导出
+
+每行一个条目：
+
+    词表    {"index": "0", "word": "词", "definitions": [...]}
+    行为表  {"index": "0", "word": "词", "actions": [...]}
+    语法表  {"rule_name": "规则组", "index": "0", "types": [{"type": ..., "value": ...}, ...]}
+
+空条目只有 index，空的规则组只有 rule_name，导出再导入可以完整还原原表。
+
+导出逐个条目写出，不在内存中拼出整个文件。导入按 chunk_size 行一组读入、
+校验并直接写入表的字典，不经过 set_a_word 等逐条接口（不打印警告、不逐条写日志），
+全部读完后再一次性重建反向索引 / 倒排索引 / 编译规则，最后按需保存一次。
+索引已存在且内容不同、以及无法解析的行作为结构化记录交给 on_conflict，
+导入结束时返回各类计数。
+"""
+
+import contextlib
+import itertools
+import json
+import sys
+from Models.Parser.ActionIndex import action_key, unique_actions
+from Models.Parser.ActionTable import ActionTable
+from Models.Parser.DicTable import DicTable
+from Models.Parser.GrammarTable import GrammarTable
+from Models.Parser.Records import EMPTY_ENTRY, Entry, Rule, paused_gc, to_json
+
+_MISSING = object()
+
+
+@contextlib.contextmanager
+def _open(target, mode):
+    """打开路径；'-' 表示标准输入 / 输出，文件对象原样使用"""
+    if target == '-':
+        yield sys.stdin if 'r' in mode else sys.stdout
+    elif isinstance(target, str):
+        with open(target, mode, encoding='utf-8') as f:
+            yield f
+    else:
+        yield target
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, default=to_json)
+
+
+def _plain(value):
+    """条目 / 规则还原为 JSON 格式，用于冲突记录"""
+    if isinstance(value, (Entry, Rule)):
+        return value.to_json()
+    return value
+
+
+def _item_key(table):
+    if isinstance(table, DicTable):
+        return 'definitions'
+    if isinstance(table, ActionTable):
+        return 'actions'
+    raise TypeError(f"不支持的表类型：{type(table).__name__}")
+
+
+def _table_dict(table):
+    if isinstance(table, GrammarTable):
+        return table.grammar_dict
+    return table.dic_dict if isinstance(table, DicTable) else table.action_dict
+
+
+def _item_lines(table_dict, item_key):
+    for index, entry in table_dict.items():
+        if entry:
+            yield _dumps({'index': index, 'word': entry[0], item_key: entry[1:]}) + '\n'
+        else:
+            yield _dumps({'index': index}) + '\n'
+
+
+def _grammar_lines(grammar_dict):
+    for rule_name, rule_data in grammar_dict.items():
+        if not rule_data:
+            yield _dumps({'rule_name': rule_name}) + '\n'
+        for index, type_indices in rule_data.items():
+            yield _dumps({'rule_name': rule_name, 'index': index, 'types': type_indices}) + '\n'
+
+
+def export_table(table, target):
+    """把表逐行导出为 JSON Lines
+
+    Args:
+        table: DicTable / ActionTable / GrammarTable（包括分片模式的表）
+        target: 输出路径、'-'（标准输出）或文本文件对象
+
+    Returns:
+        写出的行数
+    """
+    if isinstance(table, GrammarTable):
+        lines = _grammar_lines(table.grammar_dict)
+    else:
+        lines = _item_lines(_table_dict(table), _item_key(table))
+    count = 0
+    with _open(target, 'w') as f:
+        while True:
+            chunk = list(itertools.islice(lines, 10000))
+            if not chunk:
+                break
+            f.writelines(chunk)
+            count += len(chunk)
+    return count
+
+
+def _index_str(record):
+    index = record.get('index', _MISSING)
+    if index is _MISSING:
+        raise ValueError("缺少 index")
+    if isinstance(index, bool) or not isinstance(index, (str, int)):
+        raise ValueError("index 必须是字符串或整数")
+    return str(index)
+
+
+def _parse_item(record, item_key, unique):
+    """校验词表 / 行为表的一行，返回 (索引, 条目)"""
+    if not isinstance(record, dict):
+        raise ValueError("每行必须是 JSON 对象")
+    index = _index_str(record)
+    if 'word' not in record:
+        return index, EMPTY_ENTRY  # 空条目
+    word = record['word']
+    if not isinstance(word, str):
+        raise ValueError("word 必须是字符串")
+    items = record.get(item_key, [])
+    if not isinstance(items, list):
+        raise ValueError(f"{item_key} 必须是列表")
+    if unique and len(items) > 1:
+        items = unique_actions(items)
+    return index, Entry(word, items)
+
+
+def _parse_rule(record):
+    """校验语法表的一行，返回 (规则组, 索引或 None, 规则)"""
+    if not isinstance(record, dict):
+        raise ValueError("每行必须是 JSON 对象")
+    rule_name = record.get('rule_name')
+    if not isinstance(rule_name, str):
+        raise ValueError("rule_name 必须是字符串")
+    if 'index' not in record:
+        return rule_name, None, None  # 空的规则组
+    index = _index_str(record)
+    types = record.get('types')
+    if not isinstance(types, list):
+        raise ValueError("types 必须是列表")
+    return rule_name, index, Rule.from_json(types)
+
+
+def _same_entry(existing, value):
+    """两个词表 / 行为表条目是否相同
+
+    元组相等会把 1、1.0 和 True 当作同一个值，这里按 action_key 逐项比较。
+    """
+    return len(existing) == len(value) and all(
+        action_key(a) == action_key(b) for a, b in zip(existing, value)
+    )
+
+
+def import_table(table, source, overwrite=True, on_conflict=None, chunk_size=10000, save=True):
+    """从 JSON Lines 批量导入条目
+
+    导入不经过变更日志：save 为真时在结束时把整张表保存一次，
+    否则只修改内存中的表；在 batch() 中回滚时不会撤销导入的条目。
+
+    Args:
+        table: DicTable / ActionTable / GrammarTable（分片模式的表不支持）
+        source: 输入路径、'-'（标准输入）或文本文件对象
+        overwrite: 索引已存在且内容不同时是否覆盖（否则保留原内容）
+        on_conflict: 接收冲突记录的函数，记录是可以直接 JSON 序列化的字典：
+                     {'line', 'reason': 'exists', 'index', ['rule_name',] 'existing', 'incoming', 'resolution'}
+                     或 {'line', 'reason': 'invalid', 'error'}
+        chunk_size: 每次读入和校验的行数
+        save: 导入后是否保存到文件
+
+    Returns:
+        {'lines', 'imported', 'unchanged', 'overwritten', 'skipped', 'invalid'}
+    """
+    grammar = isinstance(table, GrammarTable)
+    table_dict = _table_dict(table)
+    if not grammar:
+        item_key = _item_key(table)
+    if not isinstance(table_dict, dict):
+        raise ValueError("分片存储的表不支持批量导入")
+
+    summary = dict.fromkeys(('lines', 'imported', 'unchanged', 'overwritten', 'skipped', 'invalid'), 0)
+    resolution = 'overwritten' if overwrite else 'skipped'
+
+    with _open(source, 'r') as f, paused_gc():
+        lines = enumerate(f, 1)
+        while True:
+            chunk = list(itertools.islice(lines, chunk_size))
+            if not chunk:
+                break
+            for line_no, line in chunk:
+                if not line.strip():
+                    continue
+                summary['lines'] += 1
+                try:
+                    record = json.loads(line)
+                    if grammar:
+                        rule_name, index, value = _parse_rule(record)
+                    else:
+                        index, value = _parse_item(record, item_key, isinstance(table, ActionTable))
+                except ValueError as e:  # json.JSONDecodeError 也是 ValueError
+                    summary['invalid'] += 1
+                    if on_conflict is not None:
+                        on_conflict({'line': line_no, 'reason': 'invalid', 'error': str(e)})
+                    continue
+
+                if grammar:
+                    target = table_dict.get(rule_name)
+                    if index is None:
+                        # 空的规则组：只登记规则组本身
+                        summary['imported' if target is None else 'unchanged'] += 1
+                    if target is None:
+                        target = table_dict[rule_name] = {}
+                    if index is None:
+                        continue
+                else:
+                    target = table_dict
+
+                existing = target.get(index, _MISSING)
+                if existing is _MISSING:
+                    target[index] = value
+                    summary['imported'] += 1
+                elif (existing == value) if grammar else _same_entry(existing, value):
+                    summary['unchanged'] += 1
+                else:
+                    summary[resolution] += 1
+                    if overwrite:
+                        target[index] = value
+                    if on_conflict is not None:
+                        conflict = {'line': line_no, 'reason': 'exists', 'index': index}
+                        if grammar:
+                            conflict['rule_name'] = rule_name
+                        conflict.update(existing=_plain(existing), incoming=_plain(value),
+                                        resolution=resolution)
+                        on_conflict(conflict)
+
+        # 所有条目写入之后一次性重建索引
+        if grammar:
+            table._compile_rules()
+        else:
+            table._build_word_index()
+            if isinstance(table, ActionTable) and table._action_index is not None:
+                table._action_index = None
+                table.action_index
+        table.version += 1
+
+    if save:
+        table.save()
+    return summary
@@ -0,0 +1,161 @@
+"""直接在内存映射的快照上提供查询的只读词表和行为表
+
+数据不会被解码成 dict：查找通过快照中预先排序好的排列做二分查找，
+只在命中时解码需要的字符串。多个工作进程映射同一个快照文件时，
+它们共享页缓存中的同一份物理内存。
+"""
+
+import json
+from Models.Parser.ActionIndex import ActionIndex, ActionQueries
+from Models.Parser.Records import EMPTY_ENTRY, Entry
+from Models.Parser.Snapshot import JSON_FLAG, NO_WORD
+
+
+class _MappedItemsTable:
+    """词表 / 行为表共用的只读查询实现"""
+
+    def __init__(self, reader, offset):
+        self.reader = reader
+        (self.keys, self.words, self.item_offsets, self.items,
+         self.by_key, self.by_word) = reader.items_table(offset)
+
+    def _value(self, code):
+        if code & JSON_FLAG:
+            return json.loads(self.reader.string(code & ~JSON_FLAG))
+        return self.reader.string(code)
+
+    def _find_key(self, index):
+        """二分查找索引，返回条目序号"""
+        index_str = str(index)
+        string = self.reader.string
+        keys, by_key = self.keys, self.by_key
+        low, high = 0, len(by_key)
+        while low < high:
+            mid = (low + high) // 2
+            if string(keys[by_key[mid]]) < index_str:
+                low = mid + 1
+            else:
+                high = mid
+        if low < len(by_key) and string(keys[by_key[low]]) == index_str:
+            return by_key[low]
+        return None
+
+    def _find_words(self, word):
+        """二分查找词，返回该词所有条目序号（按表中顺序）"""
+        if not isinstance(word, str):
+            return []
+        string = self.reader.string
+        words, by_word = self.words, self.by_word
+        low, high = 0, len(by_word)
+        while low < high:
+            mid = (low + high) // 2
+            if string(words[by_word[mid]]) < word:
+                low = mid + 1
+            else:
+                high = mid
+        ordinals = []
+        while low < len(by_word) and string(words[by_word[low]]) == word:
+            ordinals.append(by_word[low])
+            low += 1
+        return ordinals
+
+    def _entry_items(self, ordinal):
+        """条目中除词以外的内容（新的列表）"""
+        start, end = self.item_offsets[ordinal], self.item_offsets[ordinal + 1]
+        return [self._value(code) for code in self.items[start:end]]
+
+    def word2index(self, word):
+        """根据词查找对应的索引"""
+        ordinals = self._find_words(word)
+        if ordinals:
+            return self.reader.string(self.keys[ordinals[0]])
+        return None
+
+    def word2indices(self, word):
+        """根据词查找所有对应的索引"""
+        return [self.reader.string(self.keys[i]) for i in self._find_words(word)]
+
+    def index2word(self, index):
+        """根据索引返回词"""
+        ordinal = self._find_key(index)
+        if ordinal is None or self.words[ordinal] == NO_WORD:
+            return None
+        return self._value(self.words[ordinal])
+
+    def get_all_words(self):
+        """获取所有词"""
+        return [self._value(code) for code in self.words if code != NO_WORD]
+
+    def get_all_indices(self):
+        """获取所有索引"""
+        return [self.reader.string(key) for key in self.keys]
+
+    def entries(self):
+        """按表中顺序产出 (索引, 条目)"""
+        string = self.reader.string
+        for ordinal, key in enumerate(self.keys):
+            word = self.words[ordinal]
+            if word == NO_WORD:
+                yield string(key), EMPTY_ENTRY
+            else:
+                yield string(key), Entry(self._value(word), self._entry_items(ordinal))
+
+    def __len__(self):
+        """返回条目数量"""
+        return len(self.keys)
+
+
+class MappedDicTable(_MappedItemsTable):
+    """只读词表，接口与 DicTable 的查询部分一致"""
+
+    def __init__(self, reader):
+        if not reader.dics_offset:
+            raise ValueError("快照中没有词表")
+        super().__init__(reader, reader.dics_offset)
+
+    def get_definitions(self, word):
+        """获取词的定义（列表中除第一个元素外的所有元素）"""
+        ordinals = self._find_words(word)
+        if ordinals:
+            return self._entry_items(ordinals[0])
+        return None
+
+
+class MappedActionTable(_MappedItemsTable, ActionQueries):
+    """只读行为表，接口与 ActionTable 的查询部分一致"""
+
+    def __init__(self, reader):
+        if not reader.actions_offset:
+            raise ValueError("快照中没有行为表")
+        super().__init__(reader, reader.actions_offset)
+        self._action_index = None
+
+    @property
+    def action_index(self):
+        """行为 -> 索引 的倒排索引，第一次访问时解码所有条目的行为建立"""
+        if self._action_index is None:
+            string = self.reader.string
+            self._action_index = ActionIndex.build(
+                (string(self.keys[ordinal]), self._entry_items(ordinal))
+                for ordinal in range(len(self.keys))
+                if self.words[ordinal] != NO_WORD
+            )
+        return self._action_index
+
+    def get_actions_from_word(self, word):
+        """根据词获取对应的行为列表"""
+        ordinals = self._find_words(word)
+        if ordinals:
+            return self._entry_items(ordinals[0])
+        return None
+
+    def get_actions_from_index(self, index):
+        """根据索引获取对应的词和行为"""
+        ordinal = self._find_key(index)
+        if ordinal is None or self.words[ordinal] == NO_WORD:
+            return None
+        return {
+            'index': str(index),
+            'word': self._value(self.words[ordinal]),
+            'actions': self._entry_items(ordinal)
+        }
@@ -0,0 +1,218 @@
+"""表条目的紧凑内存表示
+
+JSON 中的条目是可变列表，语法规则的每个词性都是一个独立的字典。加载后改用：
+
+    Entry  词表 / 行为表的条目：(驻留的词, 定义 / 行为...) 元组
+    Rule   语法规则：DefParser 全局编码（族编号 << 8 | 枚举值）组成的元组
+
+两者都用 __slots__，没有实例字典，并且不可变：修改条目时整体替换为新对象，
+批量修改保存原内容时也不需要深拷贝。两者仍支持按 JSON 格式的下标、
+迭代和比较访问，写文件时还原为原来的 JSON 格式。
+"""
+
+import contextlib
+import gc
+import sys
+from Models.Parser.DefParser import FEATURE_BY_CODE, FEATURE_CODES
+
+_EMPTY = ()
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """暂停垃圾回收
+
+    加载表时只创建不会形成循环引用的容器，数量却很多，
+    暂停垃圾回收可以省去大量对整个堆的无用扫描。
+    """
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+class Entry(tuple):
+    """词表 / 行为表的一个条目，对应 JSON 中的 [word, item1, item2, ...]
+
+    本身就是 (word, item1, item2, ...) 元组，没有额外的实例字典和列表的预留容量，
+    json 会把它直接写成列表。JSON 中的空条目 [] 对应共享的 EMPTY_ENTRY，
+    它为假，没有词（word 为 None）也没有定义 / 行为。
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, word, items=_EMPTY):
+        if type(word) is str:
+            word = sys.intern(word)
+        return tuple.__new__(cls, (word, *items))
+
+    @classmethod
+    def from_json(cls, value):
+        """把 JSON 列表转换为条目（空列表转换为 EMPTY_ENTRY）；其他值原样返回"""
+        if type(value) is list:
+            if not value:
+                return EMPTY_ENTRY
+            if type(value[0]) is str:
+                value[0] = sys.intern(value[0])
+            return tuple.__new__(cls, value)
+        return value
+
+    @classmethod
+    def convert_table(cls, table):
+        """就地把 {index: [word, ...]} 中的所有条目转换为 Entry"""
+        new = tuple.__new__
+        intern = sys.intern
+        for index, value in table.items():
+            if type(value) is list:
+                if not value:
+                    table[index] = EMPTY_ENTRY
+                    continue
+                if type(value[0]) is str:
+                    value[0] = intern(value[0])
+                table[index] = new(cls, value)
+
+    @classmethod
+    def _from_values(cls, values):
+        return EMPTY_ENTRY if not values else tuple.__new__(cls, values)
+
+    @property
+    def word(self):
+        """词；空条目为 None"""
+        return self[0] if self else None
+
+    @property
+    def items(self):
+        """定义 / 行为元组
+
+        每次访问都切片出一个新的元组（没有定义 / 行为时是共享的空元组）。
+        """
+        if len(self) <= 1:
+            return _EMPTY
+        return self[1:]
+
+    def to_json(self):
+        return list(self)
+
+    def __eq__(self, other):
+        if isinstance(other, list):
+            return list(self) == other
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = tuple.__hash__
+
+    def __reduce__(self):
+        return Entry._from_values, (tuple(self),)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # 条目不可变，回滚用的原内容可以直接共享
+        return self
+
+    def __repr__(self):
+        return repr(list(self))
+
+
+# 空条目（JSON 中的 []），所有表共享
+EMPTY_ENTRY = tuple.__new__(Entry, ())
+
+
+# (族名, 枚举值) -> 全局编码；全局编码 -> (族名, 枚举值)
+# 编码取自 FEATURE_CODES，所有规则共享同一批整数对象
+_CODE_BY_FEATURE = {(type(member).__name__, member.value): code for member, code in FEATURE_CODES.items()}
+_FEATURE_BY_CODE = {code: feature for feature, code in _CODE_BY_FEATURE.items()}
+_CANONICAL_CODES = {code: code for code in FEATURE_CODES.values()}
+
+
+class Rule:
+    """一条语法规则，对应 JSON 中的 [{"type": ..., "value": ...}, ...]"""
+
+    __slots__ = ('codes',)
+
+    def __init__(self, codes):
+        self.codes = codes
+
+    @classmethod
+    def from_json(cls, features):
+        """把词性列表打包为规则
+
+        只打包 {"type": 族名, "value": 整数} 形式的有效内置词性，并且要求能被无损还原
+        （包括键的顺序）；含有其他词性的列表原样返回。
+        """
+        if type(features) is not list:
+            return features
+        codes = []
+        lookup = _CODE_BY_FEATURE.get
+        for raw_type in features:
+            if type(raw_type) is not dict or len(raw_type) != 2 or next(iter(raw_type)) != 'type':
+                return features
+            value = raw_type.get('value')
+            if type(value) is not int:
+                return features
+            code = lookup((raw_type['type'], value))
+            if code is None:
+                return features
+            codes.append(code)
+        return cls(tuple(codes))
+
+    @classmethod
+    def from_codes(cls, codes):
+        """由全局编码创建规则（编码必须有效，否则抛出 KeyError）"""
+        return cls(tuple(map(_CANONICAL_CODES.__getitem__, codes)))
+
+    def features(self):
+        """规则的词性枚举成员元组"""
+        return tuple(map(FEATURE_BY_CODE.__getitem__, self.codes))
+
+    def to_json(self):
+        return [
+            {'type': type_name, 'value': value}
+            for type_name, value in map(_FEATURE_BY_CODE.__getitem__, self.codes)
+        ]
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __iter__(self):
+        # 逐个还原词性，不先生成整个列表
+        for code in self.codes:
+            type_name, value = _FEATURE_BY_CODE[code]
+            yield {'type': type_name, 'value': value}
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return Rule(self.codes[key]).to_json()
+        type_name, value = _FEATURE_BY_CODE[self.codes[key]]
+        return {'type': type_name, 'value': value}
+
+    def __eq__(self, other):
+        if isinstance(other, Rule):
+            return self.codes == other.codes
+        if isinstance(other, (list, tuple)):
+            return self.to_json() == list(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __repr__(self):
+        return repr(self.to_json())
+
+
+def to_json(value):
+    """json.dump 的 default 钩子：把 Entry / Rule 还原为 JSON 格式"""
+    if isinstance(value, (Entry, Rule)):
+        return value.to_json()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,196 @@
+"""基于词表的正向最大匹配分词
+
+把 DicTable（以及可选的 ActionTable）中的所有词编译成一棵前缀树，
+对未分词的文本只扫描一遍：在每个位置沿前缀树尽量向后走，取最长的词。
+前缀树以“前缀 -> 编码”的哈希表表示，每个前缀一个条目，比逐字符的嵌套字典节省
+大量内存；文本中的前缀一旦不在表中就停止向后尝试。编码的最低位表示该前缀本身是否是
+完整的词，其余位是以它为真前缀的词的数量，删除词时据此判断前缀是否还需要保留。
+
+分词器登记在两张表的 word_listeners 中：表中新增或删除一个词时只更新该词的各个前缀，
+不重新编译；表的反向索引整体重建（例如批量导入）后才在下一次分词时重新编译。
+"""
+
+import threading
+
+
+class Segmenter:
+    """正向最大匹配分词器
+
+    第一次分词时读取两张表的所有词建立前缀表；分片模式下这是一次全表扫描。
+
+    Args:
+        dic_table: 词表
+        action_table: 行为表（可选），其中的词也参与匹配
+    """
+
+    def __init__(self, dic_table, action_table=None):
+        self.dic_table = dic_table
+        self.action_table = action_table
+        self._prefixes = None  # 第一次分词时编译
+        self._build_lock = threading.Lock()
+        self._listen(True)
+
+    def _listen(self, listen):
+        """在两张表的 word_listeners 中登记或注销自己"""
+        for table in self._tables():
+            # 只读的表（例如内存映射的快照）不会变化，没有 word_listeners
+            listeners = getattr(table, 'word_listeners', None)
+            if listeners is not None:
+                if listen:
+                    listeners.add(self)
+                else:
+                    listeners.discard(self)
+
+    def _tables(self):
+        if self.action_table is None:
+            return (self.dic_table,)
+        return (self.dic_table, self.action_table)
+
+    def _build(self):
+        """把所有词编译为 前缀 -> 编码 的表
+
+        在局部的表中编译完成后一次赋值发布，并发分词的线程不会看到编译了一半的表；
+        多个线程同时第一次分词时只编译一次。
+        """
+        with self._build_lock:
+            prefixes = self._prefixes
+            if prefixes is None:
+                prefixes = {}
+                for table in self._tables():
+                    for word in table.get_all_words():
+                        self._add(word, prefixes)
+                self._prefixes = prefixes
+            return prefixes
+
+    def _ensure_built(self):
+        """返回前缀表，尚未编译时先编译"""
+        prefixes = self._prefixes
+        if prefixes is None:
+            prefixes = self._build()
+        return prefixes
+
+    def _add(self, word, prefixes=None):
+        """登记一个词及其所有真前缀（默认登记到已发布的前缀表）"""
+        if type(word) is not str or not word:
+            return
+        if prefixes is None:
+            prefixes = self._prefixes
+        code = prefixes.get(word, 0)
+        if code & 1:
+            return  # 已经登记过（例如同时出现在两张表中）
+        prefixes[word] = code | 1
+        for end in range(1, len(word)):
+            prefix = word[:end]
+            prefixes[prefix] = prefixes.get(prefix, 0) + 2
+
+    def _remove(self, word):
+        """撤销一个词，不再是任何词的前缀的前缀一并删除"""
+        if type(word) is not str or not word:
+            return
+        prefixes = self._prefixes
+        code = prefixes.get(word, 0)
+        if not code & 1:
+            return
+        if code == 1:
+            del prefixes[word]
+        else:
+            prefixes[word] = code - 1
+        for end in range(1, len(word)):
+            prefix = word[:end]
+            code = prefixes[prefix] - 2
+            if code:
+                prefixes[prefix] = code
+            else:
+                del prefixes[prefix]
+
+    # 表的通知（见 DicTable / ActionTable 的 word_listeners），尚未编译时忽略
+
+    def word_added(self, table, word):
+        """表中新增了一个词"""
+        if self._prefixes is not None:
+            self._add(word)
+
+    def word_removed(self, table, word):
+        """表中已经没有这个词了；另一张表中还有时保留"""
+        if self._prefixes is None:
+            return
+        for other in self._tables():
+            if other is not table and other.word2index(word) is not None:
+                return
+        self._remove(word)
+
+    def words_reset(self, table):
+        """表的反向索引被整体重建，下一次分词时重新编译"""
+        self._prefixes = None
+
+    def rebind(self, dic_table, action_table=None):
+        """改为跟随另一组词相同的表（例如刚复制出的表），前缀表保持不变"""
+        self._listen(False)
+        self.dic_table = dic_table
+        self.action_table = action_table
+        self._listen(True)
+
+    def copy(self, dic_table, action_table=None):
+        """为复制出的表创建分词器，已经编译的前缀表直接复制，不重新编译"""
+        segmenter = Segmenter(dic_table, action_table)
+        if self._prefixes is not None:
+            segmenter._prefixes = dict(self._prefixes)
+        return segmenter
+
+    def spans(self, text):
+        """返回 [(起始位置, 结束位置, 是否在词表中), ...]
+
+        不在词表中的字符单独成段，空白字符被跳过。
+        """
+        prefixes = self._ensure_built()
+        spans = []
+        n = len(text)
+        start = 0
+        while start < n:
+            if text[start].isspace():
+                start += 1
+                continue
+            longest = 0
+            end = start + 1
+            while end <= n:
+                code = prefixes.get(text[start:end])
+                if code is None:
+                    break
+                if code & 1:
+                    longest = end
+                end += 1
+            if longest:
+                spans.append((start, longest, True))
+                start = longest
+            else:
+                spans.append((start, start + 1, False))
+                start += 1
+        return spans
+
+    def cut(self, text):
+        """把文本切分为词列表（可以直接交给 get_grammars）"""
+        return [text[start:end] for start, end, _ in self.spans(text)]
+
+    def segment(self, text):
+        """切分文本并给出每个词在两张表中的索引
+
+        Returns:
+            [{'word', 'start', 'end', 'index', 'action_index'}, ...]，
+            不在对应表中的词索引为 None
+        """
+        results = []
+        for start, end, known in self.spans(text):
+            word = text[start:end]
+            index = action_index = None
+            if known:
+                index = self.dic_table.word2index(word)
+                if self.action_table is not None:
+                    action_index = self.action_table.word2index(word)
+            results.append({
+                'word': word,
+                'start': start,
+                'end': end,
+                'index': index,
+                'action_index': action_index
+            })
+        return results
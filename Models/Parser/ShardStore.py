@@ -0,0 +1,267 @@
+"""按需加载的分片表存储
+
+超大的词表 / 行为表可以拆成一个目录下的多个分片文件：
+
+    manifest.json         分片数量和条目数
+    entries_<n>.json      索引 -> 条目，按 crc32(索引) 分片
+    words_<n>.json        词 -> 索引列表（反向索引），按 crc32(词) 分片
+
+分片在第一次被访问时才读入，所有分片共用一个带内存预算的 LRU 缓存；
+超出预算时淘汰最久未使用的分片。被修改过的分片在写回磁盘之前一直留在缓存中，
+只有提交的修改（save=True 或批量修改成功退出）才会写回，因此未保存的修改较多时
+缓存可能暂时超出预算。
+分片文件内容是 [键, 值] 对组成的 JSON 列表，写回时通过临时文件 + 原子重命名完成。
+
+遍历整张表（items() / values() / 迭代键）是全表扫描：依次读入每个分片，
+未缓存的分片读完即丢弃，不挤占缓存。
+"""
+
+import collections
+import collections.abc
+import json
+import os
+import zlib
+from Models.Parser.ChangeLog import ChangeLog
+from Models.Parser.Records import Entry, to_json
+
+MANIFEST = 'manifest.json'
+
+
+def _shard_number(key, shard_count):
+    return zlib.crc32(str(key).encode('utf-8')) % shard_count
+
+
+def _write_json(path, data):
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, default=to_json)
+    os.replace(tmp_file, path)
+
+
+def write_shards(table_dict, directory, shard_count=256):
+    """把 {index: [word, ...]} 形式的表拆分写入分片目录"""
+    os.makedirs(directory, exist_ok=True)
+    entries = [[] for _ in range(shard_count)]
+    words = [{} for _ in range(shard_count)]
+    for index, items in table_dict.items():
+        index = str(index)
+        entries[_shard_number(index, shard_count)].append([index, items])
+        if items:
+            shard = words[_shard_number(items[0], shard_count)]
+            shard.setdefault(items[0], []).append(index)
+
+    word_count = 0
+    for number in range(shard_count):
+        _write_json(os.path.join(directory, f'entries_{number}.json'), entries[number])
+        _write_json(os.path.join(directory, f'words_{number}.json'), list(words[number].items()))
+        word_count += len(words[number])
+
+    _write_json(os.path.join(directory, MANIFEST), {
+        'shard_count': shard_count,
+        'counts': {'entries': len(table_dict), 'words': word_count}
+    })
+
+
+def compile_shards(directory, dics_file='dics.json', actions_file='actions.json',
+                   shard_count=256):
+    """从 JSON 源文件（含未压缩的变更日志）生成 SalinModel 使用的分片目录"""
+    from Models.Parser.ActionTable import ActionTable
+    from Models.Parser.DicTable import DicTable
+
+    write_shards(DicTable(dics_file).dic_dict, os.path.join(directory, 'dics'), shard_count)
+    write_shards(ActionTable(actions_file).action_dict, os.path.join(directory, 'actions'), shard_count)
+
+
+class _ShardCache:
+    """所有分片共用的 LRU 缓存，按分片文件大小估算内存占用"""
+
+    # 解码后的 Python 对象比 JSON 文本大得多，按该倍数估算
+    SIZE_FACTOR = 4
+
+    def __init__(self, memory_budget):
+        self.memory_budget = memory_budget
+        self.shards = collections.OrderedDict()  # (name, number) -> [data, size, dirty, owner]
+        self.used = 0
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, owner, number):
+        key = (owner.name, number)
+        shard = self.shards.get(key)
+        if shard is not None:
+            self.shards.move_to_end(key)
+            return shard
+
+        data, size = self.read(owner, number)
+        shard = self.shards[key] = [data, size, False, owner]
+        self.used += size
+        self._evict(keep=key)
+        return shard
+
+    def read(self, owner, number):
+        """从磁盘读入一个分片，返回 (数据, 估算的内存占用)，不放入缓存"""
+        path = owner.path(number)
+        data = {}
+        size = 0
+        if os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                decode = owner.decode
+                if decode is None:
+                    data = dict((key_, value) for key_, value in json.load(f))
+                else:
+                    data = dict((key_, decode(value)) for key_, value in json.load(f))
+            size = os.path.getsize(path) * self.SIZE_FACTOR
+        self.loads += 1
+        return data, size
+
+    def _evict(self, keep):
+        """淘汰最久未使用的分片直到满足内存预算（保留刚访问的分片）
+
+        被修改过的分片不淘汰：其中可能有未保存或之后会被回滚的修改，
+        只能由 flush() 在修改提交后写回。
+        """
+        if self.used <= self.memory_budget:
+            return
+        for key in list(self.shards):
+            if self.used <= self.memory_budget:
+                break
+            if key == keep:
+                continue
+            data, size, dirty, owner = self.shards[key]
+            if dirty:
+                continue
+            del self.shards[key]
+            self.used -= size
+            self.evictions += 1
+
+    def flush(self):
+        """写回所有被修改过的分片，之后它们可以被正常淘汰"""
+        for (_, number), shard in self.shards.items():
+            data, size, dirty, owner = shard
+            if dirty:
+                owner.write(number, data)
+                shard[2] = False
+        self._evict(keep=None)
+
+
+class ShardedDict(collections.abc.MutableMapping):
+    """由分片组成的字典，行为与普通 dict 一致，但只在访问时加载需要的分片
+
+    注意：直接修改取出的值（例如对列表 append）不会被察觉，
+    修改后需要重新赋值 ``d[key] = value``。
+    """
+
+    def __init__(self, store, name, length, decode=None):
+        self.store = store
+        self.name = name
+        self.length = length
+        self.decode = decode  # 读入分片时转换每个值（例如转换为 Entry）
+
+    def path(self, number):
+        return os.path.join(self.store.directory, f'{self.name}_{number}.json')
+
+    def write(self, number, data):
+        _write_json(self.path(number), list(data.items()))
+
+    def _shard(self, key):
+        return self.store.cache.get(self, _shard_number(key, self.store.shard_count))
+
+    def __getitem__(self, key):
+        return self._shard(key)[0][key]
+
+    def __contains__(self, key):
+        return key in self._shard(key)[0]
+
+    def __setitem__(self, key, value):
+        shard = self._shard(key)
+        if key not in shard[0]:
+            self.length += 1
+        shard[0][key] = value
+        shard[2] = True
+
+    def __delitem__(self, key):
+        shard = self._shard(key)
+        del shard[0][key]
+        shard[2] = True
+        self.length -= 1
+
+    def _scan(self, number):
+        """一个分片的数据：已缓存时直接使用（含未写回的修改），否则从磁盘读入但不缓存"""
+        cache = self.store.cache
+        shard = cache.shards.get((self.name, number))
+        if shard is not None:
+            return shard[0]
+        return cache.read(self, number)[0]
+
+    def __iter__(self):
+        # 逐个分片遍历；复制键列表，遍历过程中可以修改
+        for number in range(self.store.shard_count):
+            yield from list(self._scan(number))
+
+    def items(self):
+        """逐个分片遍历 (键, 值)（全表扫描，不填充缓存）"""
+        for number in range(self.store.shard_count):
+            yield from list(self._scan(number).items())
+
+    def values(self):
+        """逐个分片遍历值（全表扫描，不填充缓存）"""
+        for number in range(self.store.shard_count):
+            yield from list(self._scan(number).values())
+
+    def __len__(self):
+        return self.length
+
+
+class ShardChangeLog(ChangeLog):
+    """分片表的持久化：不写日志文件，而是把被修改的分片写回磁盘
+
+    批量修改的回滚和 save=False 的语义与 ChangeLog 相同：
+    被修改的分片留在缓存中，直到下一次提交时随 flush() 一起写回。
+    """
+
+    def __init__(self, store):
+        super().__init__(store.directory)
+        # 分片表没有 JSON 快照和日志文件
+        self.json_file = None
+        self.log_file = None
+        self.store = store
+
+    def replay(self, data):
+        return data
+
+    def _flush(self, data):
+        # 被修改的分片已经包含所有未写入的键，不需要逐个生成记录
+        if self._unsaved:
+            self._unsaved = {}
+            self.store.flush()
+
+    def append(self, records):
+        if records:
+            self.store.flush()
+
+    def compact(self, data):
+        self.store.flush()
+
+
+class ShardStore:
+    """一个分片目录：条目分片 + 反向索引分片，共用一个 LRU 缓存"""
+
+    def __init__(self, directory, memory_budget=256 * 1024 * 1024):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST), 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.shard_count = manifest['shard_count']
+        self.cache = _ShardCache(memory_budget)
+        self.entries = ShardedDict(self, 'entries', manifest['counts']['entries'], Entry.from_json)
+        self.words = ShardedDict(self, 'words', manifest['counts']['words'])
+
+    def change_log(self):
+        return ShardChangeLog(self)
+
+    def flush(self):
+        """写回被修改的分片和条目数"""
+        self.cache.flush()
+        _write_json(os.path.join(self.directory, MANIFEST), {
+            'shard_count': self.shard_count,
+            'counts': {'entries': len(self.entries), 'words': len(self.words)}
+        })
@@ -0,0 +1,437 @@
+"""三张表的二进制快照格式
+
+JSON 仍然是可编辑的源格式；快照是由 JSON 编译出来的只读产物，用于快速启动。
+文件中所有数组都是 4 字节对齐的本机字节序 uint32：
+
+    头部      MAGIC, 版本, 字节序标记, 字符串池/词表/行为表/语法表/源文件 的偏移（uint64）
+    字符串池  S, blob 字节数, 字节偏移[S+1], 字符偏移[S+1], UTF-8 blob
+    词/行为表 n, m, 索引[n], 词[n], 条目偏移[n+1], 条目[m], 按索引排序[n],
+              w, 按词排序[w]
+    语法表    g, r, f, 规则组名[g], 规则组偏移[g+1], 规则索引[r], 词性偏移[r+1], 词性[f]
+    源文件    字节数, UTF-8 JSON：{表名: [JSON 文件的 [大小, 修改时间], 变更日志的 [大小, 修改时间]]}
+
+字符串都以字符串池编号存储。条目和词性中最高位为 1 的编码表示
+“字符串池中的 JSON 文本”，用于非字符串的条目和无法识别的词性。
+词性编码为 DefParser 中的全局编码：族编号 << 8 | 枚举值。
+
+源文件区段记录编译时各表 JSON 文件和变更日志的状态（不存在的文件为 null）。
+从快照加载的表没有经过日志重放，源文件在编译之后发生变化时快照已经过期，
+此时用它保存会以旧数据覆盖 JSON 文件并删除日志，见 stale_sources。
+"""
+
+import array
+import json
+import mmap
+import os
+import struct
+import sys
+from Models.Parser.DefParser import FAMILY_BY_NAME, FAMILY_CODES, FEATURE_BY_CODE
+from Models.Parser.Records import EMPTY_ENTRY, Entry, Rule, paused_gc
+
+MAGIC = b'SALNSNP1'
+VERSION = 2
+BYTE_ORDER_MARK = 0x01020304
+HEADER = struct.Struct('=8sII5Q')
+TABLE_NAMES = ('dics', 'actions', 'grammars')
+
+JSON_FLAG = 0x80000000  # 条目/词性编码的最高位：值是 JSON 文本
+NO_WORD = 0xFFFFFFFF    # 空条目（没有词）
+
+# 词性编码沿用 DefParser 的全局编码空间（族编号 << 8 | 枚举值）
+_FAMILY_NAMES = {code: family.__name__ for family, code in FAMILY_CODES.items()}
+
+if array.array('I').itemsize != 4:
+    raise ImportError("快照格式要求 4 字节的 array('I')")
+
+
+class _StringPool:
+    """写入快照时收集去重后的字符串"""
+
+    def __init__(self):
+        self.ids = {}
+        self.strings = []
+
+    def add(self, s):
+        sid = self.ids.get(s)
+        if sid is None:
+            sid = self.ids[s] = len(self.strings)
+            self.strings.append(s)
+        return sid
+
+    def add_value(self, value):
+        """字符串直接入池，其他 JSON 值以 JSON 文本入池并打上标记"""
+        if type(value) is str:
+            return self.add(value)
+        return JSON_FLAG | self.add(json.dumps(value, ensure_ascii=False))
+
+
+def encode_feature(raw_type, pool):
+    """把 grammars.json 中的一个词性编码为 uint32"""
+    if isinstance(raw_type, dict) and len(raw_type) == 2:
+        family = FAMILY_CODES.get(FAMILY_BY_NAME.get(raw_type.get('type')))
+        value = raw_type.get('value')
+        if family and type(value) is int and 0 < value < 256:
+            return family << 8 | value
+    # 其他词性（包括字符串）一律以 JSON 文本保存，避免与枚举编码冲突
+    return JSON_FLAG | pool.add(json.dumps(raw_type, ensure_ascii=False))
+
+
+def decode_feature(code, strings):
+    """把 uint32 词性编码还原为 grammars.json 中的格式"""
+    if code & JSON_FLAG:
+        return json.loads(strings[code & ~JSON_FLAG])
+    return {'type': _FAMILY_NAMES[code >> 8], 'value': code & 0xFF}
+
+
+def _u32(values):
+    return array.array('I', values).tobytes()
+
+
+def _pad(data):
+    return data + b'\0' * (-len(data) % 4)
+
+
+def _pack_items_table(table, pool):
+    """打包词表或行为表：{index: [word, item1, item2, ...]}，或按顺序产出的 (index, entry)"""
+    keys = []
+    words = []
+    offsets = [0]
+    items = []
+    for index, entry in table.items() if isinstance(table, dict) else table:
+        keys.append(pool.add(str(index)))
+        if entry:
+            words.append(pool.add_value(entry[0]))
+            items.extend(pool.add_value(item) for item in entry[1:])
+        else:
+            words.append(NO_WORD)
+        offsets.append(len(items))
+
+    strings = pool.strings
+    ordinals = range(len(keys))
+    by_key = sorted(ordinals, key=lambda i: strings[keys[i]])
+    # 只有字符串词可以按词查找；同一个词按表中顺序排列
+    by_word = sorted(
+        (i for i in ordinals if not words[i] & JSON_FLAG),
+        key=lambda i: strings[words[i]]
+    )
+    return b''.join([
+        _u32([len(keys), len(items)]),
+        _u32(keys), _u32(words), _u32(offsets), _u32(items),
+        _u32(by_key), _u32([len(by_word)]), _u32(by_word),
+    ])
+
+
+def _pack_grammar_table(table, pool):
+    """打包语法表：{rule_name: {index: [词性, ...]}}"""
+    group_names = []
+    group_offsets = [0]
+    rule_keys = []
+    feature_offsets = [0]
+    features = []
+    for rule_name, rule_data in table.items():
+        group_names.append(pool.add(str(rule_name)))
+        for index, type_indices in rule_data.items():
+            rule_keys.append(pool.add(str(index)))
+            features.extend(encode_feature(t, pool) for t in type_indices)
+            feature_offsets.append(len(features))
+        group_offsets.append(len(rule_keys))
+    return b''.join([
+        _u32([len(group_names), len(rule_keys), len(features)]),
+        _u32(group_names), _u32(group_offsets),
+        _u32(rule_keys), _u32(feature_offsets), _u32(features),
+    ])
+
+
+def _pack_pool(pool):
+    blobs = [s.encode('utf-8') for s in pool.strings]
+    byte_offsets = [0]
+    char_offsets = [0]
+    for s, blob in zip(pool.strings, blobs):
+        byte_offsets.append(byte_offsets[-1] + len(blob))
+        char_offsets.append(char_offsets[-1] + len(s))
+    blob = b''.join(blobs)
+    return b''.join([
+        _u32([len(blobs), len(blob)]),
+        _u32(byte_offsets), _u32(char_offsets), _pad(blob),
+    ])
+
+
+def _pack_sources(sources):
+    blob = json.dumps(sources).encode('utf-8')
+    return _u32([len(blob)]) + _pad(blob)
+
+
+def source_stats(json_file):
+    """表的 JSON 文件和变更日志的 [大小, 修改时间]，不存在的文件为 None"""
+    stats = []
+    for path in (json_file, json_file + '.log'):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stats.append(None)
+        else:
+            stats.append([stat.st_size, stat.st_mtime_ns])
+    return stats
+
+
+def stale_sources(recorded, files):
+    """返回源文件在编译快照之后发生过变化的表名
+
+    Args:
+        recorded: 快照中记录的源文件状态（SnapshotReader.sources()）
+        files: {表名: 该表的 JSON 文件路径}
+
+    Returns:
+        过期的表名列表；快照没有记录源文件时返回 None（无法判断）。
+        源文件全部不存在的表不算过期：快照是它唯一的数据来源。
+    """
+    if recorded is None:
+        return None
+    stale = []
+    for name, json_file in files.items():
+        current = source_stats(json_file)
+        if current != [None, None] and current != recorded.get(name):
+            stale.append(name)
+    return stale
+
+
+def write_snapshot(path, dic_dict=None, action_dict=None, grammar_dict=None, sources=None):
+    """把三张表的数据写入二进制快照（不存在的表写为空）
+
+    词表和行为表可以是 {索引: 条目} 字典，也可以是按表中顺序产出 (索引, 条目) 的
+    可迭代对象（例如表的 entries()）。
+
+    sources 是编译时源文件的状态（{表名: source_stats(...)}），没有时不写源文件区段。
+    """
+    pool = _StringPool()
+    sections = [
+        _pack_items_table(dic_dict, pool) if dic_dict is not None else b'',
+        _pack_items_table(action_dict, pool) if action_dict is not None else b'',
+        _pack_grammar_table(grammar_dict, pool) if grammar_dict is not None else b'',
+        _pack_sources(sources) if sources is not None else b'',
+    ]
+    # 字符串池必须在所有表打包之后生成
+    sections.insert(0, _pack_pool(pool))
+
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position if section else 0)
+        position += len(section)
+
+    tmp_file = path + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER_MARK, *offsets))
+        for section in sections:
+            f.write(section)
+    # 原子替换，正在读取旧快照的进程不受影响
+    os.replace(tmp_file, path)
+
+
+def compile_snapshot(path, dics_file='dics.json', actions_file='actions.json',
+                     grammars_file='grammars.json'):
+    """从 JSON 源文件（含未压缩的变更日志）编译二进制快照，并记录源文件的状态"""
+    from Models.Parser.ActionTable import ActionTable
+    from Models.Parser.DicTable import DicTable
+    from Models.Parser.GrammarTable import GrammarTable
+
+    files = dict(zip(TABLE_NAMES, (dics_file, actions_file, grammars_file)))
+    while True:
+        # 加载时重放日志可能截掉不完整的末行；加载前后状态一致时才记录，
+        # 否则（包括加载期间被其他进程修改）重新加载
+        sources = {name: source_stats(json_file) for name, json_file in files.items()}
+        tables = (
+            DicTable(dics_file).dic_dict,
+            ActionTable(actions_file).action_dict,
+            GrammarTable(grammars_file).grammar_dict,
+        )
+        if stale_sources(sources, files) == []:
+            break
+    write_snapshot(path, *tables, sources=sources)
+
+
+def _unpack_header(buffer):
+    """校验头部，返回各区段的偏移"""
+    magic, version, mark, *offsets = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise ValueError("不是有效的表快照文件")
+    if version != VERSION:
+        raise ValueError(f"不支持的快照版本：{version}，请重新编译快照")
+    if mark != BYTE_ORDER_MARK:
+        raise ValueError("快照的字节序与本机不一致")
+    return offsets
+
+
+class SnapshotReader:
+    """解析快照文件的各个区段，数组都是对底层缓冲区的零拷贝视图"""
+
+    def __init__(self, buffer):
+        self.buffer = memoryview(buffer)
+        offsets = _unpack_header(self.buffer)
+        (self.pool_offset, self.dics_offset, self.actions_offset, self.grammars_offset,
+         self.sources_offset) = offsets
+
+        count, blob_size = self._u32_at(self.pool_offset, 2)
+        position = self.pool_offset + 8
+        self.string_count = count
+        self.byte_offsets = self._u32_at(position, count + 1)
+        self.char_offsets = self._u32_at(position + 4 * (count + 1), count + 1)
+        self.blob_offset = position + 8 * (count + 1)
+        self.blob = self.buffer[self.blob_offset:self.blob_offset + blob_size]
+
+    def _u32_at(self, position, count):
+        return self.buffer[position:position + 4 * count].cast('I')
+
+    def _arrays(self, position, *counts):
+        """从 position 开始依次切出若干 uint32 数组"""
+        arrays = []
+        for count in counts:
+            arrays.append(self._u32_at(position, count))
+            position += 4 * count
+        return arrays, position
+
+    def items_table(self, offset):
+        """返回 (keys, words, item_offsets, items, by_key, by_word)"""
+        n, m = self._u32_at(offset, 2)
+        (keys, words, item_offsets, items, by_key, word_count), position = self._arrays(
+            offset + 8, n, n, n + 1, m, n, 1
+        )
+        by_word = self._u32_at(position, word_count[0])
+        return keys, words, item_offsets, items, by_key, by_word
+
+    def grammar_table(self, offset):
+        """返回 (group_names, group_offsets, rule_keys, feature_offsets, features)"""
+        g, r, f = self._u32_at(offset, 3)
+        arrays, _ = self._arrays(offset + 12, g, g + 1, r, r + 1, f)
+        return tuple(arrays)
+
+    def sources(self):
+        """编译时源文件的状态，快照没有记录时返回 None"""
+        if not self.sources_offset:
+            return None
+        size = self._u32_at(self.sources_offset, 1)[0]
+        position = self.sources_offset + 4
+        return json.loads(str(self.buffer[position:position + size], 'utf-8'))
+
+    def string(self, sid):
+        """按编号解码单个字符串"""
+        return str(self.blob[self.byte_offsets[sid]:self.byte_offsets[sid + 1]], 'utf-8')
+
+    def all_strings(self):
+        """一次性解码整个字符串池"""
+        text = str(self.blob, 'utf-8')
+        offsets = self.char_offsets
+        return [text[offsets[i]:offsets[i + 1]] for i in range(self.string_count)]
+
+
+def _values(codes, strings):
+    """把一组条目编码解码为 JSON 值"""
+    return [
+        strings[code] if code < JSON_FLAG else json.loads(strings[code & ~JSON_FLAG])
+        for code in codes
+    ]
+
+
+def _load_items_table(reader, offset, strings):
+    keys, words, item_offsets, items, _, _ = reader.items_table(offset)
+    keys = [strings[key] for key in keys.tolist()]
+    words = words.tolist()
+    empty = [i for i, word in enumerate(words) if word == NO_WORD]
+    for i in empty:
+        words[i] = 0
+    words = _values(words, strings)
+    items = _values(items.tolist(), strings)
+    item_offsets = item_offsets.tolist()
+
+    # 字符串池中相同的字符串只解码一次，词已经在两张表之间共享，不需要再驻留
+    new = tuple.__new__
+    table = {
+        key: new(Entry, (word, *items[start:end]))
+        for key, word, start, end in zip(keys, words, item_offsets, item_offsets[1:])
+    }
+    for i in empty:
+        table[keys[i]] = EMPTY_ENTRY
+    return table
+
+
+def _load_grammar_table(reader, offset, strings):
+    group_names, group_offsets, rule_keys, feature_offsets, features = reader.grammar_table(offset)
+    rule_keys = [strings[key] for key in rule_keys.tolist()]
+    feature_offsets = feature_offsets.tolist()
+    group_offsets = group_offsets.tolist()
+
+    features = features.tolist()
+    valid_codes = {
+        code for code in set(features)
+        if code < JSON_FLAG and FEATURE_BY_CODE[code] is not None
+    }
+
+    def rule(start, end):
+        codes = features[start:end]
+        # 只含有效内置词性的规则直接打包为 Rule，其他规则还原为 JSON 格式
+        if valid_codes.issuperset(codes):
+            return Rule.from_codes(codes)
+        return [decode_feature(code, strings) for code in codes]
+
+    table = {}
+    for g, name in enumerate(group_names.tolist()):
+        first, last = group_offsets[g], group_offsets[g + 1]
+        table[strings[name]] = {
+            rule_keys[r]: rule(feature_offsets[r], feature_offsets[r + 1])
+            for r in range(first, last)
+        }
+    return table
+
+
+def read_sources(path):
+    """只读取快照中记录的源文件状态（见 SnapshotReader.sources）"""
+    with open(path, 'rb') as f:
+        sources_offset = _unpack_header(f.read(HEADER.size))[-1]
+        if not sources_offset:
+            return None
+        f.seek(sources_offset)
+        size, = struct.unpack('=I', f.read(4))
+        return json.loads(f.read(size).decode('utf-8'))
+
+
+def load_snapshot(path):
+    """读取快照，返回 (dic_dict, action_dict, grammar_dict)，不存在的表为 None"""
+    with open(path, 'rb') as f:
+        reader = SnapshotReader(f.read())
+
+    with paused_gc():
+        strings = reader.all_strings()
+        return (
+            _load_items_table(reader, reader.dics_offset, strings) if reader.dics_offset else None,
+            _load_items_table(reader, reader.actions_offset, strings) if reader.actions_offset else None,
+            _load_grammar_table(reader, reader.grammars_offset, strings) if reader.grammars_offset else None,
+        )
+
+
+class _PoolView:
+    """按需解码字符串池中的字符串（只读映射模式下不解码整个池）"""
+
+    def __init__(self, reader):
+        self.reader = reader
+
+    def __getitem__(self, sid):
+        return self.reader.string(sid)
+
+
+def open_snapshot(path):
+    """以只读内存映射方式打开快照，多个进程共享页缓存中的同一份数据"""
+    with open(path, 'rb') as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return SnapshotReader(mapped)
+
+
+def load_grammar_table(reader):
+    """从（映射的）快照中只解码语法表，不存在时返回 None"""
+    if not reader.grammars_offset:
+        return None
+    return _load_grammar_table(reader, reader.grammars_offset, _PoolView(reader))
+
+
+if __name__ == '__main__':
+    # python -m Models.Parser.Snapshot tables.snap [dics.json actions.json grammars.json]
+    compile_snapshot(*sys.argv[1:])
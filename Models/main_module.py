@@ -1,8 +1,687 @@
+import collections
+import contextlib
+import copy
+import itertools
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import weakref
 import Models.Parser.ActionTable
+import Models.Parser.GrammarAligner
 import Models.Parser.GrammarTable
 import Models.Parser.DicTable
-class SalinModel:
+import Models.Parser.Instrumentation
+import Models.Parser.MappedTables
+import Models.Parser.Segmenter
+import Models.Parser.ShardStore
+import Models.Parser.Snapshot
+
+# 工作进程（以及服务的工作线程）通过这个全局变量访问模型；
+# 进程池在 initializer 中设置它，父进程中的值不受影响
+_worker_model = None
+
+def _pool_context():
+    """工作进程池的启动方式
+
+    父进程中可能已经有其他线程（服务的事件循环、文件监视线程），在这样的进程中
+    fork 可能复制出被其他线程持有的锁；优先使用 forkserver，不支持时使用 spawn。
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+def _load_worker(options):
+    """按 SalinModel.worker_options() 的参数加载工作进程使用的模型"""
+    model = SalinModel(snapshot=options['snapshot'], read_only=True,
+                       instrument=options['instrument'])
+    model.set_feature_weights(*options['feature_weights'])
+    return model
+
+def _init_worker(options):
+    """进程池的 initializer：在工作进程中映射父进程写出的快照"""
+    global _worker_model
+    _worker_model = _load_worker(options)
+
+def _match_chunk(args):
+    """工作进程中匹配一组句子"""
+    sentences, min_match = args
+    grammar_table = _worker_model.grammar_table
+    return [grammar_table.get_grammars(words, min_match) for words in sentences]
+
+class TableSet:
+    """一组一起加载、一起发布的词表、行为表和语法表
+
+    SalinModel 通过整体替换 TableSet 来发布新的数据（重新加载文件或 edit()），
+    已发布的 TableSet 不会再被这两种方式修改。查询开始时取一次 model.tables
+    并一直使用它，即使期间发生替换，看到的也始终是同一版本的三张表。
+
+    Args:
+        dic_table: 词表
+        action_table: 行为表
+        grammar_table: 语法表（与 dic_table 共享词表）
+        signature: 加载时表文件的 (修改时间, 大小)，用于判断文件是否发生变化
+        feature_weights: 保序对齐的 (权重, 默认权重)
+    """
+
+    def __init__(self, dic_table, action_table, grammar_table, signature=None,
+                 feature_weights=(None, 1.0)):
+        self.dic_table = dic_table
+        self.action_table = action_table
+        self.grammar_table = grammar_table
+        self.signature = signature
+        self.feature_weights = feature_weights
+        # 保序对齐引擎和分词器，第一次使用时创建
+        self._aligner = None
+        self._segmenter = None
+
+    @property
+    def aligner(self):
+        """按词序、加权匹配规则的 GrammarAligner"""
+        if self._aligner is None:
+            self._aligner = Models.Parser.GrammarAligner.GrammarAligner(
+                self.grammar_table, *self.feature_weights
+            )
+        return self._aligner
+
+    @property
+    def segmenter(self):
+        """基于词表和行为表的正向最大匹配分词器"""
+        if self._segmenter is None:
+            self._segmenter = Models.Parser.Segmenter.Segmenter(self.dic_table, self.action_table)
+        return self._segmenter
+
+    def prepare(self, previous=None):
+        """在发布之前建好 previous 上已经用到的对齐前缀树、分词前缀表和行为倒排索引，
+        替换后的第一次查询不需要再等待构建"""
+        if previous is None:
+            return
+        if previous._aligner is not None:
+            self.aligner._ensure_built()
+        if previous._segmenter is not None:
+            self.segmenter._ensure_built()
+        if getattr(previous.action_table, '_action_index', None) is not None:
+            self.action_table.action_index
+
+    @contextlib.contextmanager
+    def batch(self, save=True):
+        """同时对三张表进行批量修改，退出时统一写入，发生异常时全部回滚"""
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(self.dic_table.batch(save))
+            stack.enter_context(self.action_table.batch(save))
+            stack.enter_context(self.grammar_table.batch(save))
+            yield self
+
+
+class TableDraft:
+    """edit() 中交给调用者的一组表：每张表在第一次被访问时才复制，没有用到的表沿用原表
+
+    复制出的表立即进入批量修改（退出 edit() 时统一写入变更日志，发生异常时整体丢弃）。
+    语法表引用词表：只复制了词表时，发布的语法表是共享全部规则数据、
+    改用新词表的浅副本（见 GrammarTable.bind）。已经编译的分词器随复制出的表一起
+    复制，之后增量更新；没有变化的表上的对齐引擎和分词器直接沿用。
+
+    Args:
+        base: 当前发布的 TableSet
+        enter: 让复制出的表进入批量修改的函数（接收表，返回上下文管理器）
+    """
+
+    TABLE_NAMES = ('dic_table', 'action_table', 'grammar_table')
+
+    def __init__(self, base, enter):
+        self.base = base
+        self._enter = enter
+        self._copies = {}
+        self._segmenter = None
+
+    def _current(self, name):
+        table = self._copies.get(name)
+        return getattr(self.base, name) if table is None else table
+
+    def _table(self, name):
+        table = self._copies.get(name)
+        if table is not None:
+            return table
+        base = self.base
+        table = self._copies[name] = getattr(base, name).copy()
+        if name == 'grammar_table':
+            table.dic_table = self._current('dic_table')
+        elif name == 'dic_table' and 'grammar_table' in self._copies:
+            self._copies['grammar_table'].dic_table = table
+        if name != 'grammar_table':
+            # 分词器跟随复制出的表，之后的修改增量更新它
+            dic_table, action_table = self._current('dic_table'), self._current('action_table')
+            if self._segmenter is not None:
+                self._segmenter.rebind(dic_table, action_table)
+            elif base._segmenter is not None:
+                self._segmenter = base._segmenter.copy(dic_table, action_table)
+        self._enter(table)
+        return table
+
+    @property
+    def dic_table(self):
+        return self._table('dic_table')
+
+    @property
+    def action_table(self):
+        return self._table('action_table')
+
+    @property
+    def grammar_table(self):
+        return self._table('grammar_table')
+
+    def finish(self):
+        """组装要发布的 TableSet"""
+        base = self.base
+        copies = self._copies
+        dic_table = self._current('dic_table')
+        action_table = self._current('action_table')
+        grammar_table = self._current('grammar_table')
+        if 'dic_table' in copies and 'grammar_table' not in copies:
+            grammar_table = grammar_table.bind(dic_table)
+        tables = TableSet(dic_table, action_table, grammar_table, base.signature, base.feature_weights)
+        if 'dic_table' in copies or 'action_table' in copies:
+            tables._segmenter = self._segmenter
+        else:
+            tables._segmenter = base._segmenter
+        if base._aligner is not None:
+            if grammar_table is base.grammar_table:
+                tables._aligner = base._aligner
+            elif 'grammar_table' not in copies:
+                tables._aligner = base._aligner.bind(grammar_table)
+        return tables
+
+
+class _Workers:
+    """工作进程使用的表快照和进程池
+
+    父进程把当前的一组表（包括尚未保存的修改）写成临时的只读快照，工作进程以内存映射
+    方式打开它，多个进程共享页缓存中的同一份数据，看到的与当前进程中的查询完全相同。
+    快照写出后先在父进程中加载一次，加载失败时直接抛出异常，不会启动反复失败的进程池。
+
+    表没有被替换或修改时，快照和进程池在多次调用之间沿用；否则下一次调用写出新的快照、
+    启动新的进程池，旧的进程池在使用它的调用全部结束后关闭。
+    """
+
     def __init__(self):
-        self.action_table = Models.Parser.ActionTable.ActionTable()
-        self.grammar_table = Models.Parser.GrammarTable.GrammarTable()
-        self.dic_table = Models.Parser.DicTable.DicTable()
\ No newline at end of file
+        self._lock = threading.Lock()
+        self._directory = None
+        self._count = 0
+        self._key = None        # 当前快照对应的 (TableSet, 三张表的版本, 是否统计)
+        self._options = None    # 当前快照的工作进程参数
+        self._written = set()   # 写出的快照文件
+        self._kept = set()      # 交给了外部（见 SalinModel.worker_options）的快照，关闭时才删除
+        self._pool = None       # 当前的 (进程池, 进程数, 快照路径)
+        self._users = {}        # (进程池, 进程数, 快照路径) -> 正在使用它的调用数
+
+    def _current(self, tables):
+        """当前这组表的工作进程参数，表发生变化时写出新的快照（调用者持有锁）"""
+        instrument = Models.Parser.Instrumentation.enabled()
+        # 只保留 TableSet 的弱引用，已经被替换的表不会因此留在内存中
+        key = (weakref.ref(tables), tuple(getattr(table, 'version', 0) for table in
+                             (tables.dic_table, tables.action_table, tables.grammar_table)),
+               instrument)
+        if key == self._key:
+            return self._options
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix='salin_workers_')
+        self._count += 1
+        path = os.path.join(self._directory, f'tables-{self._count}.snap')
+        self._written.add(path)
+        Models.Parser.Snapshot.write_snapshot(
+            path, tables.dic_table.entries(), tables.action_table.entries(),
+            tables.grammar_table.grammar_dict
+        )
+        options = {
+            'snapshot': path,
+            'instrument': instrument,
+            'feature_weights': tables.feature_weights,
+        }
+        _load_worker(options)
+        self._key, self._options = key, options
+        self._sweep()
+        return options
+
+    def _sweep(self):
+        """删除不再被用到的快照（调用者持有锁）"""
+        in_use = {snapshot for _, _, snapshot in self._users} | self._kept
+        if self._options is not None:
+            in_use.add(self._options['snapshot'])
+        if self._pool is not None:
+            in_use.add(self._pool[2])
+        for path in self._written - in_use:
+            self._written.discard(path)
+            with contextlib.suppress(OSError):
+                os.remove(path)
+
+    def options(self, tables):
+        """当前这组表的工作进程参数；快照在 close() 之前一直保留"""
+        with self._lock:
+            options = self._current(tables)
+            self._kept.add(options['snapshot'])
+            return options
+
+    @contextlib.contextmanager
+    def pool(self, tables, processes):
+        """使用当前这组表上的进程池"""
+        with self._lock:
+            options = self._current(tables)
+            if self._pool is None or self._pool[1:] != (processes, options['snapshot']):
+                retired, self._pool = self._pool, None
+                if retired is not None and not self._users.get(retired):
+                    retired[0].close()
+                self._pool = (
+                    _pool_context().Pool(processes, _init_worker, (options,)),
+                    processes, options['snapshot']
+                )
+                self._sweep()
+            current = self._pool
+            self._users[current] = self._users.get(current, 0) + 1
+        try:
+            yield current[0]
+        finally:
+            with self._lock:
+                self._users[current] -= 1
+                if not self._users[current]:
+                    del self._users[current]
+                    if current is not self._pool:
+                        current[0].close()
+                        self._sweep()
+
+    def close(self):
+        """终止所有进程池并删除快照"""
+        with self._lock:
+            pools = {pool for pool, _, _ in self._users}
+            if self._pool is not None:
+                pools.add(self._pool[0])
+            self._pool = self._key = self._options = None
+            self._users.clear()
+            self._written.clear()
+            self._kept.clear()
+            directory, self._directory = self._directory, None
+        for pool in pools:
+            pool.terminate()
+            pool.join()
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+
+class SalinModel:
+    # 三张表的 JSON 文件（变更日志是同名的 .log 文件）
+    TABLE_FILES = {'dics': 'dics.json', 'actions': 'actions.json', 'grammars': 'grammars.json'}
+
+    def __init__(self, snapshot=None, read_only=False, shard_dir=None,
+                 memory_budget=256 * 1024 * 1024, instrument=False):
+        """
+        Args:
+            snapshot: 二进制快照文件路径（见 Models.Parser.Snapshot）；
+                      提供时从快照加载三张表，保存时仍写回各自的 JSON 文件
+            read_only: 与 snapshot 一起使用，内存映射快照并直接在映射上查询词表和行为表，
+                       多个进程共享同一份数据；此时词表和行为表不可修改
+            shard_dir: 分片目录（包含 dics/ 和 actions/ 两个分片子目录，
+                       见 Models.Parser.ShardStore）；提供时词表和行为表按需加载分片
+            memory_budget: 分片模式下每张表的分片缓存内存预算（字节）
+            instrument: 开启性能统计（见 Models.Parser.Instrumentation），
+                        在加载表之前开启，加载耗时也会被记录
+        """
+        if instrument:
+            self.enable_stats()
+
+        self.snapshot = snapshot
+        self.read_only = read_only
+        self.shard_dir = shard_dir
+        self.memory_budget = memory_budget
+        self.feature_weights = (None, 1.0)
+        # 写入者（edit() 和重新加载）之间互斥；读取者只读取 self._tables，不取这把锁
+        # （语法表的结果缓存由它自己的锁保护，只在查找和登记缓存时短暂持有）
+        self._write_lock = threading.RLock()
+        self._watcher = None
+        self._watch_stop = None
+        self._failed_signature = None
+        self._workers = _Workers()
+        weakref.finalize(self, self._workers.close)
+        # 与 reload() 一样在加载之前取签名：加载期间文件发生变化时，下一次检查会重新加载
+        signature = self._file_signature()
+        self._tables = self._load_tables()
+        self._tables.signature = signature
+
+    def _load_tables(self):
+        """按构造参数从文件加载一组新的表（包括所有索引）"""
+        weights = self.feature_weights
+        if self.shard_dir is not None:
+            action_table = Models.Parser.ActionTable.ActionTable(
+                shards=Models.Parser.ShardStore.ShardStore(
+                    os.path.join(self.shard_dir, 'actions'), self.memory_budget
+                )
+            )
+            dic_table = Models.Parser.DicTable.DicTable(
+                shards=Models.Parser.ShardStore.ShardStore(
+                    os.path.join(self.shard_dir, 'dics'), self.memory_budget
+                )
+            )
+            # 规则匹配依赖全部规则的编译索引，语法表始终完整加载
+            grammar_table = Models.Parser.GrammarTable.GrammarTable(
+                self.TABLE_FILES['grammars'], dic_table=dic_table
+            )
+            return TableSet(dic_table, action_table, grammar_table, feature_weights=weights)
+
+        if self.snapshot is not None and self.read_only:
+            reader = Models.Parser.Snapshot.open_snapshot(self.snapshot)
+            action_table = Models.Parser.MappedTables.MappedActionTable(reader)
+            dic_table = Models.Parser.MappedTables.MappedDicTable(reader)
+            # 规则匹配依赖编译后的内存索引，语法表仍然解码为普通的 GrammarTable
+            grammar_table = Models.Parser.GrammarTable.GrammarTable(
+                self.TABLE_FILES['grammars'], dic_table=dic_table,
+                data=Models.Parser.Snapshot.load_grammar_table(reader)
+            )
+            if reader.grammars_offset:
+                self._check_snapshot(reader.sources(), {'grammars': grammar_table})
+            return TableSet(dic_table, action_table, grammar_table, feature_weights=weights)
+
+        dic_data = action_data = grammar_data = None
+        if self.snapshot is not None:
+            sources = Models.Parser.Snapshot.read_sources(self.snapshot)
+            dic_data, action_data, grammar_data = Models.Parser.Snapshot.load_snapshot(self.snapshot)
+
+        action_table = Models.Parser.ActionTable.ActionTable(self.TABLE_FILES['actions'], data=action_data)
+        dic_table = Models.Parser.DicTable.DicTable(self.TABLE_FILES['dics'], data=dic_data)
+        # 语法表与模型共享同一个词表，匹配时不再重新读取 dics.json
+        grammar_table = Models.Parser.GrammarTable.GrammarTable(
+            self.TABLE_FILES['grammars'], dic_table=dic_table, data=grammar_data
+        )
+        if self.snapshot is not None:
+            # 快照中没有的表已经从 JSON 文件加载，不需要检查
+            self._check_snapshot(sources, {
+                name: table
+                for name, table, data in (('dics', dic_table, dic_data),
+                                          ('actions', action_table, action_data),
+                                          ('grammars', grammar_table, grammar_data))
+                if data is not None
+            })
+        return TableSet(dic_table, action_table, grammar_table, feature_weights=weights)
+
+    def _check_snapshot(self, sources, tables):
+        """确认快照不比表的源文件旧
+
+        从快照加载的表没有重放变更日志；源文件在编译快照之后发生变化时，
+        保存会用旧数据覆盖 JSON 文件并删除日志，因此拒绝加载。
+        快照没有记录源文件状态时无法判断，允许加载，但这些表不能写入文件。
+
+        Args:
+            sources: 快照中记录的源文件状态
+            tables: {表名: 从快照加载的表}
+        """
+        stale = Models.Parser.Snapshot.stale_sources(
+            sources, {name: table.json_file for name, table in tables.items()}
+        )
+        if stale is None:
+            for table in tables.values():
+                table.change_log.frozen = "快照没有记录源文件状态，无法确认是否最新，不能写入文件"
+        elif stale:
+            raise ValueError(
+                f"快照编译之后源文件发生了变化（{'、'.join(stale)}），请重新编译快照"
+            )
+
+    @property
+    def tables(self):
+        """当前发布的 TableSet；一次查询中的多次访问应先取出它再使用"""
+        return self._tables
+
+    @property
+    def dic_table(self):
+        return self._tables.dic_table
+
+    @property
+    def action_table(self):
+        return self._tables.action_table
+
+    @property
+    def grammar_table(self):
+        return self._tables.grammar_table
+
+    def _watched_files(self):
+        """重新加载所依据的文件；分片模式不支持重新加载，返回空列表"""
+        if self.shard_dir is not None:
+            return []
+        if self.snapshot is not None:
+            return [self.snapshot]
+        return [
+            path
+            for json_file in self.TABLE_FILES.values()
+            for path in (json_file, json_file + '.log')
+        ]
+
+    def _file_signature(self):
+        """被监视文件的 (修改时间, 大小)，不存在的文件为 None"""
+        signature = []
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _publish(self, tables):
+        """原子地替换当前的 TableSet（一次属性赋值，读取者不会看到中间状态）"""
+        self._tables = tables
+
+    def reload(self, force=False):
+        """表文件发生变化时重新加载，建好所有索引后原子地替换当前的表
+
+        加载在调用线程中进行，期间查询继续使用旧的表。分片模式不支持重新加载；
+        通过 batch() 就地修改但尚未写入文件的内容会被丢弃。
+
+        Args:
+            force: 文件没有变化也重新加载
+
+        Returns:
+            是否替换了表
+        """
+        if self.shard_dir is not None:
+            raise ValueError("分片模式不支持重新加载")
+        with self._write_lock:
+            # 在加载之前取签名：加载期间文件再次变化时，下一次检查还会重新加载
+            signature = self._file_signature()
+            if not force and signature == self._tables.signature:
+                return False
+            tables = self._load_tables()
+            tables.signature = signature
+            tables.prepare(self._tables)
+            self._publish(tables)
+            return True
+
+    def watch(self, interval=1.0):
+        """启动后台线程，每隔 interval 秒检查表文件，发生变化时调用 reload()
+
+        文件正在被写入等原因导致加载失败时保留旧的表，在文件下一次变化时重试。
+        通过 worker_options() 启动的工作进程（例如服务的进程池）不会看到重新加载后的表。
+        """
+        if self.shard_dir is not None:
+            raise ValueError("分片模式不支持重新加载")
+        if self._watcher is not None:
+            return
+        self._watch_stop = threading.Event()
+        self._watcher = threading.Thread(
+            target=self._watch_loop, args=(interval, self._watch_stop),
+            name='salin-reload', daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        """停止后台检查线程"""
+        if self._watcher is None:
+            return
+        self._watch_stop.set()
+        self._watcher.join()
+        self._watcher = None
+        self._watch_stop = None
+
+    def _watch_loop(self, interval, stop):
+        while not stop.wait(interval):
+            signature = self._file_signature()
+            if signature == self._tables.signature or signature == self._failed_signature:
+                continue
+            try:
+                self.reload()
+                self._failed_signature = None
+            except Exception as e:
+                self._failed_signature = signature
+                print(f"重新加载表文件失败，继续使用旧的表：{type(e).__name__}: {e}", file=sys.stderr)
+
+    @contextlib.contextmanager
+    def edit(self, save=True):
+        """在当前表的副本上批量修改，退出时原子地发布修改后的表
+
+        与 batch() 不同，修改期间正在进行的查询不受影响，也不会看到修改了一半的表；
+        发生异常时丢弃副本，当前的表保持不变。写入者之间互斥。
+        只有被访问到的表才会被复制（见 TableDraft），没有用到的表直接沿用。
+        分片模式和只读快照模式不支持。
+
+            with model.edit() as tables:
+                tables.dic_table.remove_word('...')
+                tables.grammar_table.add_grammar_rule(...)
+
+        Args:
+            save: 退出时是否写入变更日志
+        """
+        if self.shard_dir is not None or self.read_only:
+            raise ValueError("分片模式和只读快照模式不支持 edit()")
+        with self._write_lock, contextlib.ExitStack() as stack:
+            draft = TableDraft(self._tables, lambda table: stack.enter_context(table.batch(save)))
+            yield draft
+            # 先提交各表的批量修改（写入变更日志），再发布
+            stack.close()
+            tables = draft.finish()
+            tables.prepare(self._tables)
+            if save and self.snapshot is None:
+                # 自己写入的变更日志不应触发重新加载
+                tables.signature = self._file_signature()
+            self._publish(tables)
+
+    @property
+    def aligner(self):
+        """当前表上按词序、加权匹配规则的 GrammarAligner"""
+        return self._tables.aligner
+
+    @property
+    def segmenter(self):
+        """当前表上的正向最大匹配分词器"""
+        return self._tables.segmenter
+
+    def set_feature_weights(self, weights, default_weight=1.0):
+        """设置保序对齐中各词性的权重（{词性: 权重}，不能为负数）"""
+        Models.Parser.GrammarAligner.check_weights(weights, default_weight)
+        with self._write_lock:
+            self.feature_weights = (weights, default_weight)
+            tables = copy.copy(self._tables)
+            tables.feature_weights = self.feature_weights
+            tables._aligner = None
+            self._publish(tables)
+
+    def align_grammars(self, words, k=10, min_score=1.0):
+        """返回与句子按词序对齐得分最高的 k 条规则（见 GrammarAligner.align）"""
+        return self._tables.aligner.align(words, k, min_score)
+
+    def match_text(self, text, min_match=5):
+        """对未分词的文本先分词，再匹配语法规则"""
+        tables = self._tables
+        return tables.grammar_table.get_grammars(tables.segmenter.cut(text), min_match)
+
+    def enable_stats(self):
+        """开启性能统计（对所有表实例生效）"""
+        Models.Parser.Instrumentation.enable()
+
+    def disable_stats(self):
+        """关闭性能统计，已有的统计保留"""
+        Models.Parser.Instrumentation.disable()
+
+    def stats(self):
+        """返回调用耗时、分位数和计数器（见 Stats.snapshot）"""
+        return Models.Parser.Instrumentation.STATS.snapshot()
+
+    def stats_prometheus(self):
+        """以 Prometheus 文本格式返回统计"""
+        return Models.Parser.Instrumentation.STATS.prometheus()
+
+    def worker_options(self):
+        """让其他进程使用当前这组表的参数（可以序列化后传给 _init_worker）
+
+        当前的表（包括尚未保存的修改）被写成临时的只读快照，工作进程内存映射它；
+        快照保留到 close()。之后的修改和重新加载不会反映到已经启动的工作进程中。
+        """
+        return self._workers.options(self._tables)
+
+    def close(self):
+        """终止 match_batch / match_stream 的工作进程池，删除写给工作进程的临时快照"""
+        self._workers.close()
+
+    @contextlib.contextmanager
+    def batch(self, save=True):
+        """同时对三张表进行就地的批量修改，退出时统一写入，发生异常时全部回滚
+
+        修改期间其他线程可能看到修改了一半的表，并发查询时应使用 edit()。
+        """
+        with self._tables.batch(save):
+            yield self
+
+    def match_batch(self, sentences, min_match=5, processes=None, chunk_size=256,
+                    parallel_threshold=2048):
+        """批量匹配多个句子的语法规则
+
+        Args:
+            sentences: 句子列表，每个句子是一个词列表
+            min_match: 最小匹配词性数量
+            processes: 进程数（默认使用 CPU 核数，1 表示不使用进程池）
+            chunk_size: 每个任务包含的句子数量
+            parallel_threshold: 句子数量达到该值时才使用进程池
+
+        Returns:
+            与 sentences 一一对应的匹配结果列表
+        """
+        sentences = list(sentences)
+        if len(sentences) < parallel_threshold:
+            processes = 1
+        return list(self.match_stream(sentences, min_match, processes, chunk_size))
+
+    def match_stream(self, sentences, min_match=5, processes=None, chunk_size=256,
+                     max_in_flight=None):
+        """流式匹配句子，按输入顺序逐个产出结果
+
+        sentences 可以是任意（包括无限长的）可迭代对象；同一时刻最多只有
+        max_in_flight 个分块在处理中，内存占用与输入总量无关。
+
+        开始时取一次当前的表，整个调用都使用它，与是否使用进程池无关。工作进程以
+        forkserver / spawn 方式启动，内存映射父进程写出的这组表的快照（见 _Workers），
+        进程池在表没有变化时在多次调用之间沿用，close() 时终止。
+
+        Args:
+            sentences: 可迭代的句子，每个句子是一个词列表
+            min_match: 最小匹配词性数量
+            processes: 进程数（默认使用 CPU 核数，1 表示在当前进程中处理）
+            chunk_size: 每个任务包含的句子数量
+            max_in_flight: 同时处理中的分块数（默认是进程数的 2 倍）
+        """
+        tables = self._tables
+        if processes == 1:
+            grammar_table = tables.grammar_table
+            for words in sentences:
+                yield grammar_table.get_grammars(words, min_match)
+            return
+
+        with self._workers.pool(tables, processes) as pool:
+            if max_in_flight is None:
+                max_in_flight = 2 * (processes or os.cpu_count() or 1)
+            in_flight = collections.deque()
+            sentences = iter(sentences)
+            while True:
+                chunk = list(itertools.islice(sentences, chunk_size))
+                if not chunk:
+                    break
+                in_flight.append(pool.apply_async(_match_chunk, ((chunk, min_match),)))
+                if len(in_flight) >= max_in_flight:
+                    yield from in_flight.popleft().get()
+            while in_flight:
+                yield from in_flight.popleft().get()
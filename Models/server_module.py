@@ -0,0 +1,202 @@
+"""基于 asyncio 的本地查询服务
+
+协议是 TCP 上的 JSON Lines：每行一个请求，每行一个响应。
+
+    请求  {"id": 1, "method": "get_grammars", "params": {"words": [...], "min_match": 5}}
+          {"id": 2, "method": "get_top_grammars", "params": {"words": [...], "k": 10, "min_match": 5}}
+          {"id": 3, "method": "align_grammars", "params": {"words": [...], "k": 10, "min_score": 1.0}}
+          {"id": 4, "method": "segment", "params": {"text": "..."}}
+          {"id": 5, "method": "get_definitions", "params": {"word": "..."}}
+          {"id": 6, "method": "get_actions_from_word", "params": {"word": "..."}}
+          {"id": 7, "method": "words_by_actions", "params": {"actions": [...], "all": false}}
+          {"id": 8, "method": "stats"}
+    响应  {"id": 1, "result": ...} 或 {"id": 1, "error": "..."}
+
+同一连接上的请求可以并发发出，响应按完成顺序返回，用 id 对应。
+所有连接的请求先进入一个队列，凑满 max_batch 个或等待超过 max_wait 秒后
+作为一批交给工作池处理，在延迟和吞吐之间取舍。
+"""
+
+import asyncio
+import concurrent.futures
+import json
+import Models.main_module
+import Models.Parser.GrammarTable
+
+
+def _call(model, method, params):
+    """在模型上执行一个请求，返回可 JSON 序列化的结果"""
+    # 整个请求使用同一组表，处理期间表被重新加载或替换也不受影响
+    tables = model.tables
+    if method == 'get_grammars':
+        grammars = tables.grammar_table.get_grammars(
+            params.get('words', []), params.get('min_match', 5)
+        )
+        return Models.Parser.GrammarTable.GrammarTable.grammars_to_json(grammars)
+    if method == 'get_top_grammars':
+        grammars = tables.grammar_table.get_top_grammars(
+            params.get('words', []), params.get('k', 10), params.get('min_match', 5)
+        )
+        return Models.Parser.GrammarTable.GrammarTable.grammars_to_json(grammars)
+    if method == 'align_grammars':
+        type_to_json = Models.Parser.GrammarTable.GrammarTable.type_to_json
+        results = tables.aligner.align(
+            params.get('words', []), params.get('k', 10), params.get('min_score', 1.0)
+        )
+        return [
+            dict(
+                result,
+                rule_types=[type_to_json(t) for t in result['rule_types']],
+                alignment=[dict(a, type=type_to_json(a['type'])) for a in result['alignment']]
+            )
+            for result in results
+        ]
+    if method == 'segment':
+        return tables.segmenter.segment(params['text'])
+    if method == 'get_definitions':
+        return tables.dic_table.get_definitions(params['word'])
+    if method == 'get_actions_from_word':
+        return tables.action_table.get_actions_from_word(params['word'])
+    if method == 'words_by_actions':
+        # 默认返回含有任意一个行为的词，all 为真时返回同时含有所有行为的词
+        if params.get('all', False):
+            return tables.action_table.words_by_all_actions(params.get('actions', []))
+        return tables.action_table.words_by_any_action(params.get('actions', []))
+    if method == 'stats':
+        # 使用进程池时只包含处理该请求的工作进程中的统计
+        return model.stats()
+    raise ValueError(f"未知的方法：{method}")
+
+
+def _run_batch(requests):
+    """在工作线程 / 工作进程中处理一批 (method, params) 请求"""
+    model = Models.main_module._worker_model
+    results = []
+    for method, params in requests:
+        try:
+            results.append((True, _call(model, method, params)))
+        except Exception as e:
+            results.append((False, f"{type(e).__name__}: {e}"))
+    return results
+
+
+class MicroBatcher:
+    """把并发到达的请求收集成小批量，再交给工作池处理"""
+
+    def __init__(self, executor, max_batch=64, max_wait=0.002):
+        self.executor = executor
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, method, params):
+        """提交一个请求，等待它所在的批次处理完成"""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((method, params, future))
+        return await future
+
+    async def run(self):
+        """持续收集批次并分发（作为后台任务运行）"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 不等待这一批完成，立即开始收集下一批
+            loop.create_task(self._dispatch(batch))
+
+    async def _dispatch(self, batch):
+        self.batches += 1
+        self.requests += len(batch)
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(
+                self.executor, _run_batch, [(method, params) for method, params, _ in batch]
+            )
+        except Exception as e:
+            results = [(False, f"{type(e).__name__}: {e}")] * len(batch)
+        for (_, _, future), (ok, value) in zip(batch, results):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+
+class SalinServer:
+    """SalinModel 的本地 TCP 服务
+
+    Args:
+        model: 已加载的 SalinModel
+        max_batch: 每批最多的请求数
+        max_wait: 凑批时最多等待的秒数
+        workers: 工作线程 / 进程数
+        use_processes: 使用进程池代替线程池；工作进程以 forkserver / spawn 方式启动，
+                       内存映射服务启动时这组表的快照（见 SalinModel.worker_options），
+                       看不到之后的修改和重新加载
+    """
+
+    def __init__(self, model, max_batch=64, max_wait=0.002, workers=None, use_processes=False):
+        self.model = model
+        if use_processes:
+            # 快照在这里写出并在当前进程中校验，工作进程在 initializer 中映射它
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                workers, mp_context=Models.main_module._pool_context(),
+                initializer=Models.main_module._init_worker,
+                initargs=(model.worker_options(),)
+            )
+        else:
+            # 工作线程通过这个全局变量访问模型
+            Models.main_module._worker_model = model
+            self.executor = concurrent.futures.ThreadPoolExecutor(workers)
+        self.batcher = MicroBatcher(self.executor, max_batch, max_wait)
+
+    async def _handle_request(self, line, writer):
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            result = await self.batcher.submit(request['method'], request.get('params', {}))
+            response = {'id': request_id, 'result': result}
+        except Exception as e:
+            response = {'id': request_id, 'error': str(e)}
+        writer.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+        await writer.drain()
+
+    async def _handle_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._handle_request(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def serve(self, host='127.0.0.1', port=8765):
+        """启动服务并一直运行"""
+        batcher_task = asyncio.create_task(self.batcher.run())
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+            self.executor.shutdown(wait=False)
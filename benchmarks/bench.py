@@ -0,0 +1,202 @@
+"""词表 / 行为表 / 语法表的基准测试
+
+在临时目录（或 --data 指定的目录）中生成合成数据，依次测量：
+加载、word2index / index2word、get_grammars、find_rules_by_type、修改和 save()。
+每项输出吞吐量、单次调用延迟的 p50 / p95 / p99，以及该阶段的内存峰值（tracemalloc）。
+
+    python -m benchmarks.bench --size 100000 --rules 10000
+    python -m benchmarks.bench --size 1000000 --json > bench_output.json
+
+tracemalloc 本身会让被测代码变慢，测延迟时可以加 --no-memory 关闭。
+"""
+
+import argparse
+import contextlib
+import gc
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from benchmarks.synthetic import generate_all, word_for
+from Models.Parser.ActionTable import ActionTable
+from Models.Parser.DefParser import TYPE_FAMILIES
+from Models.Parser.DicTable import DicTable
+from Models.Parser.GrammarTable import GrammarTable
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+class Bench:
+    """记录每一项测试的结果"""
+
+    def __init__(self, trace_memory=True):
+        self.trace_memory = trace_memory
+        self.results = []
+
+    def run(self, name, func, arguments):
+        """对 arguments 中的每一项调用一次 func，记录单次延迟"""
+        latencies = []
+        if self.trace_memory:
+            tracemalloc.start()
+        gc.collect()
+        start = time.perf_counter()
+        for argument in arguments:
+            t0 = time.perf_counter_ns()
+            func(argument)
+            latencies.append(time.perf_counter_ns() - t0)
+        elapsed = time.perf_counter() - start
+        peak = 0
+        if self.trace_memory:
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+        latencies.sort()
+        result = {
+            'name': name,
+            'calls': len(latencies),
+            'seconds': elapsed,
+            'ops_per_sec': len(latencies) / elapsed if elapsed else 0.0,
+            'mean_us': statistics.fmean(latencies) / 1000 if latencies else 0.0,
+            'p50_us': _percentile(latencies, 0.50) / 1000,
+            'p95_us': _percentile(latencies, 0.95) / 1000,
+            'p99_us': _percentile(latencies, 0.99) / 1000,
+            'peak_mb': peak / (1024 * 1024)
+        }
+        self.results.append(result)
+        return result
+
+    def once(self, name, func):
+        """只调用一次的测试（加载、保存），返回 func 的结果"""
+        value = []
+        self.run(name, lambda _: value.append(func()), [None])
+        return value[0]
+
+    def report(self, out=sys.stdout):
+        header = f"{'测试':<28}{'次数':>9}{'ops/s':>12}{'p50 µs':>11}{'p95 µs':>11}{'p99 µs':>11}{'峰值 MB':>10}"
+        print(header, file=out)
+        for r in self.results:
+            print(f"{r['name']:<28}{r['calls']:>9}{r['ops_per_sec']:>12.1f}"
+                  f"{r['p50_us']:>11.1f}{r['p95_us']:>11.1f}{r['p99_us']:>11.1f}{r['peak_mb']:>10.1f}",
+                  file=out)
+
+
+# --data 目录中记录生成参数的文件；参数不一致时重新生成数据
+PARAMS_FILE = 'bench_params.json'
+TABLE_FILES = ('dics.json', 'actions.json', 'grammars.json')
+
+
+def prepare_data(directory, size, rule_count=None, min_features=2, max_features=8):
+    """确保 directory 中是按这些参数生成的数据，缺少数据或参数不一致时重新生成"""
+    params = {
+        'size': size,
+        'rules': max(1, size // 10) if rule_count is None else rule_count,
+        'min_features': min_features,
+        'max_features': max_features,
+    }
+    params_file = os.path.join(directory, PARAMS_FILE)
+    try:
+        with open(params_file, 'r', encoding='utf-8') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        recorded = None
+    if recorded == params and os.path.exists(os.path.join(directory, 'dics.json')):
+        return
+    generate_all(directory, size, params['rules'], min_features, max_features)
+    # 旧数据留下的变更日志不能重放到新数据上
+    for name in TABLE_FILES:
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(os.path.join(directory, name + '.log'))
+    with open(params_file, 'w', encoding='utf-8') as f:
+        json.dump(params, f)
+
+
+def run_benchmarks(directory, size, queries=10000, sentence_length=8, min_match=5,
+                   trace_memory=True, seed=3):
+    """在 directory 中已生成的数据上运行所有测试，返回 Bench"""
+    rng = random.Random(seed)
+    bench = Bench(trace_memory)
+    dics_file = os.path.join(directory, 'dics.json')
+    actions_file = os.path.join(directory, 'actions.json')
+    grammars_file = os.path.join(directory, 'grammars.json')
+
+    dic_table = bench.once('加载 dics.json', lambda: DicTable(dics_file))
+    action_table = bench.once('加载 actions.json', lambda: ActionTable(actions_file))
+    grammar_table = bench.once('加载 grammars.json', lambda: GrammarTable(grammars_file, dic_table))
+
+    indices = [rng.randrange(size) for _ in range(queries)]
+    bench.run('word2index', dic_table.word2index, [word_for(i) for i in indices])
+    bench.run('index2word', dic_table.index2word, indices)
+    bench.run('get_definitions', dic_table.get_definitions, [word_for(i) for i in indices])
+    bench.run('get_actions_from_word', action_table.get_actions_from_word, [word_for(i) for i in indices])
+
+    # 句子中的词取自前 rule_count 个索引附近，保证大部分词能标注词性
+    rule_count = sum(len(rules) for rules in grammar_table.compiled_rules.values())
+    word_range = max(1, min(size, rule_count * 2))
+    sentences = [
+        [word_for(rng.randrange(word_range)) for _ in range(sentence_length)]
+        for _ in range(max(1, queries // 10))
+    ]
+    grammar_table.clear_cache()
+    bench.run('get_grammars（未缓存）', lambda words: grammar_table.get_grammars(words, min_match), sentences)
+    bench.run('get_grammars（缓存命中）', lambda words: grammar_table.get_grammars(words, min_match), sentences)
+
+    members = [member for family in TYPE_FAMILIES for member in family]
+    bench.run('find_rules_by_type', grammar_table.find_rules_by_type,
+              [rng.choice(members) for _ in range(min(len(members) * 4, queries))])
+
+    # 修改：新增词条和为已有词添加定义，都不立即保存
+    new_indices = range(size, size + queries)
+    bench.run('set_a_word', lambda i: dic_table.set_a_word(word_for(i), i, ['新定义']), new_indices)
+    bench.run('add_definition', lambda i: dic_table.add_definition(word_for(i), '追加定义'), indices)
+    bench.run('set_an_action', lambda i: action_table.set_an_action(i, word_for(i), [0]), new_indices)
+    bench.once('DicTable.save', dic_table.save)
+    bench.once('ActionTable.save', action_table.save)
+    bench.once('GrammarTable.save', grammar_table.save)
+    return bench
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Text_Salin_Tr 基准测试")
+    parser.add_argument('--size', type=int, default=100000, help="词表 / 行为表条目数")
+    parser.add_argument('--rules', type=int, default=None, help="语法规则数量（默认 size / 10）")
+    parser.add_argument('--min-features', type=int, default=2, help="每条规则最少词性数")
+    parser.add_argument('--max-features', type=int, default=8, help="每条规则最多词性数")
+    parser.add_argument('--queries', type=int, default=10000, help="每项查询测试的调用次数")
+    parser.add_argument('--sentence-length', type=int, default=8, help="get_grammars 的句子长度")
+    parser.add_argument('--min-match', type=int, default=5)
+    parser.add_argument('--data', help="数据目录；生成参数与上次相同时沿用已有数据（测试在副本上进行，不改写其中的文件）")
+    parser.add_argument('--no-memory', action='store_true', help="不用 tracemalloc 统计内存峰值")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    directory = args.data or tempfile.mkdtemp(prefix='salin_bench_')
+    # 修改和 save() 会改写表文件：--data 的数据复制到一次性的目录中再测试，
+    # 下一次运行看到的仍是刚生成时的数据，修改走的也是同样的代码路径
+    work_dir = tempfile.mkdtemp(prefix='salin_bench_') if args.data else directory
+    try:
+        prepare_data(directory, args.size, args.rules, args.min_features, args.max_features)
+        if work_dir != directory:
+            for name in TABLE_FILES:
+                shutil.copy(os.path.join(directory, name), work_dir)
+        bench = run_benchmarks(work_dir, args.size, args.queries, args.sentence_length,
+                               args.min_match, not args.no_memory)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        print(json.dumps(bench.results, ensure_ascii=False, indent=2))
+    else:
+        bench.report()
+
+
+if __name__ == '__main__':
+    main()
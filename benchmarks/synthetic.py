@@ -0,0 +1,87 @@
+"""生成任意规模的合成 dics.json / actions.json / grammars.json
+
+数据逐条写入文件，生成 10^7 级别的表也不需要把整张表放进内存。
+语法规则的索引取自词表索引的前 rule_count 个，这样 GrammarTable 给词标注词性时能够命中。
+"""
+
+import argparse
+import json
+import os
+import random
+from Models.Parser.DefParser import TYPE_FAMILIES
+
+
+def _write_entries(path, entries):
+    """把 (键, 值) 序列写成一个 JSON 对象，每个条目一行"""
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{\n')
+        first = True
+        for key, value in entries:
+            if not first:
+                f.write(',\n')
+            first = False
+            f.write(f'    {json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}')
+        f.write('\n}\n')
+
+
+def word_for(index):
+    """第 index 个合成词"""
+    return f'词{index}'
+
+
+def generate_dics(path, count, max_definitions=3, seed=0):
+    rng = random.Random(seed)
+    _write_entries(path, (
+        (str(i), [word_for(i)] + [f'定义{rng.randrange(10000)}' for _ in range(rng.randint(0, max_definitions))])
+        for i in range(count)
+    ))
+
+
+def generate_actions(path, count, max_actions=3, action_vocabulary=1000, seed=1):
+    rng = random.Random(seed)
+    _write_entries(path, (
+        (str(i), [word_for(i)] + rng.sample(range(action_vocabulary), rng.randint(0, max_actions)))
+        for i in range(count)
+    ))
+
+
+def generate_grammars(path, rule_count, group_count=100, min_features=2, max_features=8, seed=2):
+    """生成 rule_count 条规则，平均分到 group_count 个规则组，每条规则的词性数量在给定范围内"""
+    rng = random.Random(seed)
+    members = [member for family in TYPE_FAMILIES for member in family]
+    group_count = max(1, min(group_count, rule_count))
+    per_group = -(-rule_count // group_count)
+
+    def groups():
+        for g in range(group_count):
+            rules = {}
+            for i in range(g * per_group, min(rule_count, (g + 1) * per_group)):
+                rules[str(i)] = [
+                    {'type': type(member).__name__, 'value': member.value}
+                    for member in rng.choices(members, k=rng.randint(min_features, max_features))
+                ]
+            yield f'规则组{g}', rules
+
+    _write_entries(path, groups())
+
+
+def generate_all(directory, size, rule_count=None, min_features=2, max_features=8):
+    """在 directory 中生成三张表；语法规则数量默认是词表的十分之一"""
+    os.makedirs(directory, exist_ok=True)
+    if rule_count is None:
+        rule_count = max(1, size // 10)
+    generate_dics(os.path.join(directory, 'dics.json'), size)
+    generate_actions(os.path.join(directory, 'actions.json'), size)
+    generate_grammars(os.path.join(directory, 'grammars.json'), rule_count,
+                      min_features=min_features, max_features=max_features)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="生成合成表数据")
+    parser.add_argument('directory')
+    parser.add_argument('--size', type=int, default=100000, help="词表 / 行为表条目数")
+    parser.add_argument('--rules', type=int, default=None, help="语法规则数量")
+    parser.add_argument('--min-features', type=int, default=2, help="每条规则最少词性数")
+    parser.add_argument('--max-features', type=int, default=8, help="每条规则最多词性数")
+    args = parser.parse_args()
+    generate_all(args.directory, args.size, args.rules, args.min_features, args.max_features)
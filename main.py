@@ -1,4 +1,153 @@
 import Models.main_module
+import Models.server_module
+import Models.Parser.ActionTable
+import Models.Parser.DicTable
+import Models.Parser.GrammarTable
+import Models.Parser.JsonLines
+import argparse
+import asyncio
+import collections
+import json
 import os
+import sys
+
+
+def stream(model, args):
+    """从文件或标准输入逐行读取句子（已分词，或配合 --segment 使用原始文本），把匹配结果逐行写为 JSON Lines
+
+    同一时刻只有有限个句子在处理中，内存占用与输入大小无关。
+    """
+    source = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8')
+    target = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    # 已读入但还没输出结果的句子（结果按输入顺序产出）
+    pending = collections.deque()
+
+    def sentences():
+        for line in source:
+            if args.segment:
+                words = model.segmenter.cut(line)  # 未分词的文本，按词表切分
+            else:
+                words = line.split()  # 词之间以空白分隔
+            pending.append(words)
+            yield words
+
+    try:
+        results = model.match_stream(
+            sentences(), args.min_match, args.processes, args.chunk_size, args.window
+        )
+        for grammars in results:
+            record = {
+                'words': pending.popleft(),
+                'grammars': Models.Parser.GrammarTable.GrammarTable.grammars_to_json(grammars)
+            }
+            target.write(json.dumps(record, ensure_ascii=False) + '\n')
+        target.flush()
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if target is not sys.stdout:
+            target.close()
+
+
+# 表名 -> (表类, 默认文件)
+TABLES = {
+    'dics': (Models.Parser.DicTable.DicTable, 'dics.json'),
+    'actions': (Models.Parser.ActionTable.ActionTable, 'actions.json'),
+    'grammars': (Models.Parser.GrammarTable.GrammarTable, 'grammars.json'),
+}
+
+
+def table_io(args):
+    """单独加载一张表，以 JSON Lines 导出或批量导入（不加载整个模型）"""
+    table_class, default_file = TABLES[args.table]
+    json_file = args.file or default_file
+    if args.command == 'export':
+        count = Models.Parser.JsonLines.export_table(table_class(json_file), args.output)
+        print(json.dumps({'exported': count}), file=sys.stderr)
+        return
+
+    # 表文件不存在时从空表开始，导入后新建该文件
+    table = table_class(json_file, data=None if os.path.exists(json_file) else {})
+    conflicts = sys.stderr if args.conflicts == '-' else open(args.conflicts, 'w', encoding='utf-8')
+    try:
+        summary = Models.Parser.JsonLines.import_table(
+            table, args.input, overwrite=not args.skip_existing,
+            on_conflict=lambda record: conflicts.write(json.dumps(record, ensure_ascii=False) + '\n'),
+            chunk_size=args.chunk_size, save=not args.dry_run
+        )
+    finally:
+        if conflicts is not sys.stderr:
+            conflicts.close()
+    print(json.dumps(summary, ensure_ascii=False))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Text_Salin_Tr")
+    parser.add_argument('--snapshot', help="从二进制快照加载表")
+    parser.add_argument('--read-only', action='store_true', help="内存映射快照（需要 --snapshot）")
+    parser.add_argument('--shard-dir', help="从分片目录按需加载词表和行为表")
+    parser.add_argument('--stats', action='store_true', help="开启性能统计，退出时以 Prometheus 格式输出到标准错误")
+    parser.add_argument('--watch', type=float, default=None, metavar='SECONDS',
+                        help="每隔 SECONDS 秒检查表文件，发生变化时在后台重新加载")
+    commands = parser.add_subparsers(dest='command')
+
+    stream_parser = commands.add_parser('stream', help="流式匹配已分词的句子，输出 JSON Lines")
+    stream_parser.add_argument('input', nargs='?', default='-', help="输入文件（默认标准输入）")
+    stream_parser.add_argument('-o', '--output', default='-', help="输出文件（默认标准输出）")
+    stream_parser.add_argument('--min-match', type=int, default=5, help="最小匹配词性数量")
+    stream_parser.add_argument('--processes', type=int, default=1, help="工作进程数")
+    stream_parser.add_argument('--chunk-size', type=int, default=256, help="每个任务的句子数")
+    stream_parser.add_argument('--window', type=int, default=None, help="同时处理中的任务数")
+    stream_parser.add_argument('--segment', action='store_true', help="输入是未分词的文本，先按词表分词")
+
+    serve_parser = commands.add_parser('serve', help="启动本地查询服务（TCP 上的 JSON Lines）")
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8765)
+    serve_parser.add_argument('--max-batch', type=int, default=64, help="每批最多的请求数")
+    serve_parser.add_argument('--max-wait-ms', type=float, default=2.0, help="凑批最多等待的毫秒数")
+    serve_parser.add_argument('--workers', type=int, default=None, help="工作线程 / 进程数")
+    serve_parser.add_argument('--process-pool', action='store_true', help="使用进程池代替线程池")
+
+    export_parser = commands.add_parser('export', help="把一张表导出为 JSON Lines")
+    export_parser.add_argument('table', choices=sorted(TABLES))
+    export_parser.add_argument('-o', '--output', default='-', help="输出文件（默认标准输出）")
+    export_parser.add_argument('--file', help="表文件（默认 dics.json / actions.json / grammars.json）")
+
+    import_parser = commands.add_parser('import', help="从 JSON Lines 批量导入一张表")
+    import_parser.add_argument('table', choices=sorted(TABLES))
+    import_parser.add_argument('input', nargs='?', default='-', help="输入文件（默认标准输入）")
+    import_parser.add_argument('--file', help="表文件（默认 dics.json / actions.json / grammars.json）")
+    import_parser.add_argument('--skip-existing', action='store_true', help="索引已存在且内容不同时保留原内容")
+    import_parser.add_argument('--conflicts', default='-', help="冲突记录的输出文件（默认标准错误）")
+    import_parser.add_argument('--chunk-size', type=int, default=10000, help="每次读入和校验的行数")
+    import_parser.add_argument('--dry-run', action='store_true', help="只校验和统计，不写回表文件")
+    args = parser.parse_args(argv)
+    if args.read_only and args.snapshot is None:
+        parser.error("--read-only 需要与 --snapshot 一起使用")
+    return args
+
+
 if __name__ == "__main__":
-    model = Models.main_module.SalinModel()
\ No newline at end of file
+    args = parse_args()
+    if args.command in ('export', 'import'):
+        table_io(args)
+        sys.exit()
+    model = Models.main_module.SalinModel(
+        snapshot=args.snapshot, read_only=args.read_only, shard_dir=args.shard_dir,
+        instrument=args.stats
+    )
+    if args.watch:
+        model.watch(args.watch)
+    try:
+        if args.command == 'stream':
+            stream(model, args)
+        elif args.command == 'serve':
+            server = Models.server_module.SalinServer(
+                model, args.max_batch, args.max_wait_ms / 1000, args.workers, args.process_pool
+            )
+            asyncio.run(server.serve(args.host, args.port))
+    finally:
+        model.stop_watching()
+        model.close()
+        if args.stats:
+            sys.stderr.write(model.stats_prometheus())
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 测试直接导入仓库中的 Models 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
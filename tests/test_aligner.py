@@ -0,0 +1,82 @@
+"""保序加权对齐：与逐条规则的动态规划结果一致，拒绝负权重"""
+
+import json
+import random
+import pytest
+from Models.Parser.DefParser import TYPE_FAMILIES
+from Models.Parser.DicTable import DicTable
+from Models.Parser.GrammarAligner import GrammarAligner, check_weights
+from Models.Parser.GrammarTable import GrammarTable
+
+MEMBERS = [member for family in TYPE_FAMILIES for member in family][:12]
+
+
+def _weighted_lcs(sentence_types, rule_types, weight):
+    """句子（每个词一个词性集合）与规则的加权最长公共子序列"""
+    rows = [[0.0] * (len(rule_types) + 1) for _ in range(len(sentence_types) + 1)]
+    for i, types in enumerate(sentence_types, 1):
+        for j, feature in enumerate(rule_types, 1):
+            best = max(rows[i - 1][j], rows[i][j - 1])
+            if feature in types:
+                best = max(best, rows[i - 1][j - 1] + weight(feature))
+            rows[i][j] = best
+    return rows[-1][-1]
+
+
+@pytest.fixture
+def grammar_table(tmp_path):
+    rng = random.Random(7)
+    dics = {str(i): [f'词{i}'] for i in range(60)}
+    grammars = {}
+    for g in range(6):
+        grammars[f'规则组{g}'] = {
+            str(i): [{'type': type(m).__name__, 'value': m.value}
+                     for m in rng.choices(MEMBERS, k=rng.randint(1, 6))]
+            for i in range(g * 10, g * 10 + 10)
+        }
+    for name, data in (('dics.json', dics), ('grammars.json', grammars)):
+        with open(tmp_path / name, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    return GrammarTable(str(tmp_path / 'grammars.json'), DicTable(str(tmp_path / 'dics.json')))
+
+
+@pytest.mark.parametrize('weights', [None, {MEMBERS[0]: 3.0, MEMBERS[1]: 0.0, MEMBERS[2]: 2.0}])
+def test_align_matches_brute_force(grammar_table, weights):
+    aligner = GrammarAligner(grammar_table, weights)
+    rng = random.Random(11)
+    matched = 0
+    for _ in range(30):
+        words = [f'词{rng.randrange(70)}' for _ in range(rng.randint(1, 8))]
+        sentence_types = [set(wt['types']) for wt in grammar_table._get_words_types(words)]
+        expected = []
+        for rule_name, rules in grammar_table.compiled_rules.items():
+            for index, rule_types in rules.items():
+                score = _weighted_lcs(sentence_types, rule_types, aligner.weight)
+                if score >= 1.0:
+                    expected.append((rule_name, index, score))
+        expected.sort(key=lambda item: -item[2])  # 稳定排序：得分相同时保持表中顺序
+
+        results = aligner.align(words, k=len(expected) + 1)
+        matched += len(results)
+        assert [(r['rule_name'], r['index'], r['score']) for r in results] == expected
+        for result in results:
+            # 对应关系保序，且每个词性都出现在对应词的词性中
+            positions = [a['position'] for a in result['alignment']]
+            rule_positions = [a['rule_position'] for a in result['alignment']]
+            assert positions == sorted(set(positions))
+            assert rule_positions == sorted(set(rule_positions))
+    assert matched
+
+
+def test_top_k_is_a_prefix_of_the_full_ranking(grammar_table):
+    aligner = GrammarAligner(grammar_table)
+    words = [f'词{i}' for i in range(0, 60, 7)]
+    full = aligner.align(words, k=1000)
+    assert aligner.align(words, k=3) == full[:3]
+
+
+def test_negative_weights_are_rejected(grammar_table):
+    with pytest.raises(ValueError):
+        check_weights({MEMBERS[0]: -1.0})
+    with pytest.raises(ValueError):
+        GrammarAligner(grammar_table, default_weight=-0.5)
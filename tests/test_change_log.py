@@ -0,0 +1,113 @@
+"""变更日志：重放、损坏记录的处理和压缩的原子性"""
+
+import json
+import os
+import pytest
+import Models.Parser.ChangeLog
+from Models.Parser.ChangeLog import ChangeLog
+from Models.Parser.DicTable import DicTable
+
+
+def _record(index, value):
+    return (json.dumps({'path': [index], 'value': value}, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+@pytest.fixture
+def dics_file(tmp_path):
+    path = tmp_path / 'dics.json'
+    path.write_text(json.dumps({'0': ['甲', '定义0'], '1': ['乙']}, ensure_ascii=False), encoding='utf-8')
+    return str(path)
+
+
+def test_edits_are_appended_and_replayed(dics_file):
+    table = DicTable(dics_file)
+    original = open(dics_file, 'rb').read()
+    table.set_a_word('丙', 2, ['定义2'], save=True)
+    table.remove_word('乙', save=True)
+
+    assert open(dics_file, 'rb').read() == original  # 只追加日志，不改写 JSON
+    reloaded = DicTable(dics_file)
+    assert reloaded.dic_dict == {'0': ['甲', '定义0'], '2': ['丙', '定义2']}
+    assert reloaded.word2index('丙') == '2'
+    assert reloaded.word2index('乙') is None
+
+
+def test_unsaved_edits_are_written_with_the_next_save(dics_file):
+    table = DicTable(dics_file)
+    table.set_a_word('丙', 2, save=False)
+    assert not os.path.exists(dics_file + '.log')
+    table.set_a_word('丁', 3, save=True)
+    assert DicTable(dics_file).dic_dict == table.dic_dict
+
+
+def test_torn_tail_is_truncated(dics_file):
+    good = _record('2', ['丙'])
+    with open(dics_file + '.log', 'wb') as f:
+        f.write(good + b'{"path": ["3"], "val')
+
+    table = DicTable(dics_file)
+    assert table.word2index('丙') == '2'
+    assert '3' not in table.dic_dict
+    assert os.path.getsize(dics_file + '.log') == len(good)
+
+
+def test_corrupt_record_in_the_middle_is_skipped(dics_file):
+    content = _record('2', ['丙']) + b'not json\n' + _record('3', ['丁'])
+    with open(dics_file + '.log', 'wb') as f:
+        f.write(content)
+
+    table = DicTable(dics_file)
+    assert table.word2index('丙') == '2'
+    assert table.word2index('丁') == '3'
+    # 有换行的损坏记录之后还有有效记录，不能截断
+    assert open(dics_file + '.log', 'rb').read() == content
+
+
+def test_append_after_torn_tail_starts_a_new_line(dics_file):
+    with open(dics_file + '.log', 'wb') as f:
+        f.write(b'{"path": ["3"], "val')
+    ChangeLog(dics_file).append([{'path': ['2'], 'value': ['丙']}])
+
+    table = DicTable(dics_file)
+    assert table.word2index('丙') == '2'
+    assert '3' not in table.dic_dict
+
+
+def test_compaction_rewrites_json_and_removes_log(dics_file):
+    table = DicTable(dics_file)
+    table.set_a_word('丙', 2, save=True)
+    table.save()
+
+    assert not os.path.exists(dics_file + '.log')
+    with open(dics_file, encoding='utf-8') as f:
+        assert json.load(f) == {'0': ['甲', '定义0'], '1': ['乙'], '2': ['丙']}
+
+
+def test_failed_compaction_keeps_json_and_log(dics_file, monkeypatch):
+    table = DicTable(dics_file)
+    table.set_a_word('丙', 2, save=True)
+    original = open(dics_file, 'rb').read()
+
+    def crash(src, dst):
+        raise OSError("模拟重命名前崩溃")
+
+    monkeypatch.setattr(Models.Parser.ChangeLog.os, 'replace', crash)
+    with pytest.raises(OSError):
+        table.save()
+    monkeypatch.undo()
+
+    assert open(dics_file, 'rb').read() == original
+    assert os.path.exists(dics_file + '.log')
+    assert DicTable(dics_file).dic_dict == table.dic_dict
+
+
+def test_batch_rollback_restores_entries_and_writes_nothing(dics_file):
+    table = DicTable(dics_file)
+    with pytest.raises(RuntimeError):
+        with table.batch():
+            table.set_a_word('丙', 2)
+            table.update_word('甲', '戊')
+            raise RuntimeError
+    assert table.dic_dict == {'0': ['甲', '定义0'], '1': ['乙']}
+    assert table.word2index('甲') == '0' and table.word2index('戊') is None
+    assert not os.path.exists(dics_file + '.log')
@@ -0,0 +1,91 @@
+"""二进制快照：与 JSON 表的往返一致、内存映射查询和过期检测"""
+
+import json
+import pytest
+from Models.main_module import SalinModel
+from Models.Parser.ActionTable import ActionTable
+from Models.Parser.DicTable import DicTable
+from Models.Parser.GrammarTable import GrammarTable
+from Models.Parser.MappedTables import MappedActionTable, MappedDicTable
+from Models.Parser.Records import to_json
+from Models.Parser.Snapshot import compile_snapshot, load_snapshot, open_snapshot
+
+DICS = {
+    '0': ['甲', '定义0', '定义1'],
+    '1': ['乙'],
+    '2': [],
+    '3': ['丙', 7, {'来源': '手工'}, ['嵌套']],
+    '10': ['甲', '同形词'],
+}
+ACTIONS = {
+    '0': ['甲', 1, 1.0, True, '跑'],
+    '1': ['乙', [1, 2], {'k': 'v'}],
+    '2': [],
+}
+GRAMMARS = {
+    '规则组0': {
+        '0': [{'type': 'DefinitionType', 'value': 1}, {'type': 'MoodType', 'value': 1}],
+        '1': [{'type': 'TenseType', 'value': 1}, {'type': 'DefinitionType', 'value': 1}],
+    },
+    '规则组1': {
+        '3': [{'type': 'OtherType', 'value': 1}, {'type': '未知词性', 'value': 3}],
+    },
+    '空规则组': {},
+}
+
+
+def _plain(data):
+    return json.loads(json.dumps(data, default=to_json))
+
+
+@pytest.fixture
+def tables(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for name, data in (('dics.json', DICS), ('actions.json', ACTIONS), ('grammars.json', GRAMMARS)):
+        with open(name, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+    compile_snapshot('tables.snap')
+    return tmp_path
+
+
+def test_round_trip_matches_json(tables):
+    dic_dict, action_dict, grammar_dict = load_snapshot('tables.snap')
+    assert _plain(dic_dict) == DICS
+    assert _plain(action_dict) == ACTIONS
+    assert _plain(grammar_dict) == GRAMMARS
+    # 与直接从 JSON 加载的表相同（包括 1、1.0 和 True 的类型）
+    assert [type(a) for a in action_dict['0']] == [type(a) for a in ActionTable('actions.json').action_dict['0']]
+    assert grammar_dict == GrammarTable('grammars.json').grammar_dict
+
+
+def test_mapped_tables_answer_like_loaded_tables(tables):
+    reader = open_snapshot('tables.snap')
+    mapped_dic, mapped_action = MappedDicTable(reader), MappedActionTable(reader)
+    dic_table, action_table = DicTable('dics.json'), ActionTable('actions.json')
+
+    for word in ('甲', '乙', '丙', '不存在'):
+        assert mapped_dic.word2index(word) == dic_table.word2index(word)
+        assert mapped_dic.word2indices(word) == dic_table.word2indices(word)
+        assert mapped_dic.get_definitions(word) == dic_table.get_definitions(word)
+        assert mapped_action.get_actions_from_word(word) == action_table.get_actions_from_word(word)
+    for index in DICS:
+        assert mapped_dic.index2word(index) == dic_table.index2word(index)
+    assert _plain(dict(mapped_dic.entries())) == DICS
+    assert mapped_action.words_by_action(True) == action_table.words_by_action(True) == ['甲']
+
+
+def test_snapshot_model_matches_json_model(tables):
+    words = ['甲', '乙', '丙']
+    expected = SalinModel().grammar_table.get_grammars(words, 1)
+    assert expected
+    assert SalinModel(snapshot='tables.snap').grammar_table.get_grammars(words, 1) == expected
+    assert SalinModel(snapshot='tables.snap', read_only=True).grammar_table.get_grammars(words, 1) == expected
+
+
+def test_stale_snapshot_is_rejected(tables):
+    SalinModel(snapshot='tables.snap')
+    DicTable('dics.json').set_a_word('丁', 4, save=True)
+    with pytest.raises(ValueError):
+        SalinModel(snapshot='tables.snap')
+    compile_snapshot('tables.snap')
+    assert SalinModel(snapshot='tables.snap').dic_table.word2index('丁') == '4'